@@ -0,0 +1,211 @@
+import numpy as np
+
+MAX_DEPTH = 21  # Bits per axis in the Morton keys, so the deepest cells are 2**-21 of the root
+
+def _spread_bits(v):
+    # Insert two zero bits between each of the low 21 bits of v
+    v = v & np.uint64(0x1fffff)
+    v = (v | v << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+    v = (v | v << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+    v = (v | v << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+    v = (v | v << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+    v = (v | v << np.uint64(2)) & np.uint64(0x1249249249249249)
+    return v
+
+def _morton(cells):
+    return _spread_bits(cells[:, 0]) | _spread_bits(cells[:, 1]) << np.uint64(1) | _spread_bits(cells[:, 2]) << np.uint64(2)
+
+class Octree:
+    """Barnes-Hut octree over point masses, stored as flat node arrays rather than node objects.
+
+    Sources are sorted along a Morton curve so every node owns a contiguous range of them, and
+    the children of a node are a contiguous range of the node arrays.
+    """
+
+    def __init__(self, sources, gm, leaf_size=16):
+        sources = np.asarray(sources, dtype=np.float64)
+        gm = np.asarray(gm, dtype=np.float64)
+        self.lo = sources.min(axis=0)
+        self.size = max((sources.max(axis=0) - self.lo).max(), 1.0) * (1 + 1e-9)
+        cells = self._cells(sources)
+        keys = _morton(cells)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        cells = cells[order]
+        self.positions = sources[order]
+        self.gm = gm[order]
+
+        starts, ends, levels = [], [], []
+        active = np.arange(len(keys))  # Sorted indices of particles in nodes that still need splitting
+        for level in range(MAX_DEPTH + 1):
+            prefix = keys[active] >> np.uint64(3 * (MAX_DEPTH - level))
+            boundary = np.flatnonzero(np.diff(prefix)) + 1
+            first = np.concatenate(([0], boundary))
+            last = np.concatenate((boundary, [len(active)]))
+            starts.append(active[first])
+            ends.append(active[last - 1] + 1)
+            levels.append(np.full(len(first), level))
+            split = (last - first > leaf_size) & (level < MAX_DEPTH)
+            active = active[np.repeat(split, last - first)]
+            if len(active) == 0:
+                break
+
+        self.start = np.concatenate(starts)
+        self.end = np.concatenate(ends)
+        self.level = np.concatenate(levels)
+        self.count = self.end - self.start
+
+        # Children of each node: the next level's nodes whose particle range falls inside it
+        self.first_child = np.zeros(len(self.start), dtype=np.int64)
+        self.child_count = np.zeros(len(self.start), dtype=np.int64)
+        offset = 0
+        for parents, children in zip(starts[:-1], starts[1:]):
+            owner = np.searchsorted(parents, children, side='right') - 1
+            child_offset = offset + len(parents)
+            counts = np.bincount(owner, minlength=len(parents))
+            self.child_count[offset:child_offset] = counts
+            self.first_child[offset:child_offset] = child_offset + np.cumsum(counts) - counts
+            offset = child_offset
+
+        self.mass = _range_sums(self.gm, self.start, self.end)
+        moments = _range_sums(self.positions * self.gm[:, None], self.start, self.end)
+        centroid = _range_sums(self.positions, self.start, self.end) / self.count[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.com = np.where(self.mass[:, None] > 0, moments / self.mass[:, None], centroid)
+
+        self.half_size = self.size / 2.0**(self.level + 1)
+        cell_index = cells[self.start] >> (np.uint64(MAX_DEPTH) - self.level.astype(np.uint64))[:, None]
+        self.center = self.lo + (cell_index + 0.5) * (2 * self.half_size)[:, None]
+
+    def accelerations(self, targets, theta=0.5, out=None, group_size=8, chunk=256):
+        """Acceleration on each (M,3) target; pairs at zero separation contribute nothing.
+
+        Nearby targets are walked through the tree together in groups of group_size, so the
+        opening tests are paid per group while the interactions are still summed per target.
+        """
+        targets = np.asarray(targets, dtype=np.float64)
+        if out is None:
+            out = np.empty((len(targets), 3))
+        order = np.argsort(_morton(self._cells(targets)), kind='stable')
+        ordered = targets[order]
+        acc = np.empty_like(ordered)
+        batch = group_size * chunk
+        for begin in range(0, len(ordered), batch):
+            acc[begin:begin + batch] = self._walk(ordered[begin:begin + batch], theta, group_size)
+        out[order] = acc
+        return out
+
+    def _cells(self, points):
+        # Integer cell coordinates at the deepest level, clamped to the root cube
+        scaled = (points - self.lo) * (2**MAX_DEPTH / self.size)
+        return np.clip(scaled, 0, 2**MAX_DEPTH - 1).astype(np.uint64)
+
+    def _walk(self, targets, theta, group_size):
+        acc = np.zeros((len(targets), 3))
+        group_start = np.arange(0, len(targets), group_size)
+        group_count = np.diff(np.append(group_start, len(targets)))
+        lo = np.minimum.reduceat(targets, group_start)
+        hi = np.maximum.reduceat(targets, group_start)
+        group_center = (lo + hi) / 2
+        group_extent = (hi - lo) / 2
+        group_radius = np.sqrt(np.einsum('ij,ij->i', group_extent, group_extent))
+
+        group = np.arange(len(group_start))
+        node = np.zeros(len(group), dtype=np.int64)
+        while len(group):
+            half = self.half_size[node]
+            d = self.com[node] - group_center[group]
+            distance = np.sqrt(np.einsum('ij,ij->i', d, d))
+            separated = (np.abs(self.center[node] - group_center[group]) > group_extent[group] + half[:, None]).any(axis=1)
+            # Every target in the group sees the node at less than theta, not just the group centre
+            far = separated & (2 * half < theta * (distance - group_radius[group]))
+            leaf = self.child_count[node] == 0
+
+            if far.any():
+                source, target = _expand(node[far], group_start[group[far]], group_count[group[far]])
+                pd = self.com[source] - targets[target]
+                self._add(acc, target, pd, np.einsum('ij,ij->i', pd, pd), self.mass[source])
+
+            near = leaf & ~far
+            if near.any():
+                source_node, target = _expand(node[near], group_start[group[near]], group_count[group[near]])
+                target, source = _expand(target, self.start[source_node], self.count[source_node])
+                pd = self.positions[source] - targets[target]
+                self._add(acc, target, pd, np.einsum('ij,ij->i', pd, pd), self.gm[source])
+
+            opened = ~leaf & ~far
+            group, node = _expand(group[opened], self.first_child[node[opened]], self.child_count[node[opened]])
+        return acc
+
+    @staticmethod
+    def _add(acc, target, d, r2, gm):
+        w = np.zeros_like(r2)
+        np.divide(gm, r2 * np.sqrt(r2), out=w, where=r2 > 0)
+        for axis in range(3):
+            acc[:, axis] += np.bincount(target, weights=w * d[:, axis], minlength=len(acc))
+
+def _range_sums(values, start, end):
+    # Sum of values[start[i]:end[i]] for every i, in one reduceat over interleaved bounds
+    padded = np.concatenate((values, np.zeros((1,) + values.shape[1:])))
+    bounds = np.empty(2 * len(start), dtype=np.int64)
+    bounds[0::2] = start
+    bounds[1::2] = end
+    return np.add.reduceat(padded, bounds)[0::2]
+
+def _expand(owner, first, count):
+    # One (owner, first + k) pair for every k < count
+    owners = np.repeat(owner, count)
+    ranks = np.arange(len(owners)) - np.repeat(np.cumsum(count) - count, count)
+    return owners, np.repeat(first, count) + ranks
+
+def barnes_hut_accelerations(targets, sources, gm, theta=0.5, out=None):
+    """Approximate gravitational_accelerations with an octree rebuilt from the current sources."""
+    if len(sources) == 0:
+        if out is None:
+            out = np.empty((len(targets), 3))
+        out[:] = 0
+        return out
+    return Octree(sources, gm).accelerations(targets, theta, out=out)
+
+def accuracy_report(body_counts=(1000, 4000, 16000), thetas=(0.3, 0.5, 0.7, 1.0), seed=0):
+    """Compare the tree against direct summation on a Sun-plus-belt system and a self-gravitating cloud.
+
+    Returns one row per (scenario, N, theta) with median/99th-percentile relative acceleration
+    error and the wall time of both methods.
+    """
+    import time
+    from gravity import gravitational_accelerations
+    from utilities import AU, G
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n in body_counts:
+        radius = rng.uniform(2 * AU, 3.5 * AU, n)
+        angle = rng.uniform(0, 2 * np.pi, n)
+        belt = np.column_stack((radius * np.cos(angle), radius * np.sin(angle), rng.normal(0, 0.05 * AU, n)))
+        belt[0] = 0
+        belt_gm = G * rng.uniform(1e15, 1e21, n)
+        belt_gm[0] = G * 1.989e30
+        cloud = rng.normal(0, AU, (n, 3))
+        cloud_gm = np.full(n, G * 1e24)
+
+        for scenario, positions, gm in (('belt', belt, belt_gm), ('cloud', cloud, cloud_gm)):
+            start = time.perf_counter()
+            exact = gravitational_accelerations(positions, positions, gm)
+            direct_time = time.perf_counter() - start
+            exact_norm = np.linalg.norm(exact, axis=1)
+            for theta in thetas:
+                start = time.perf_counter()
+                approx = barnes_hut_accelerations(positions, positions, gm, theta)
+                tree_time = time.perf_counter() - start
+                error = np.linalg.norm(approx - exact, axis=1) / exact_norm
+                rows.append({'scenario': scenario, 'bodies': n, 'theta': theta,
+                             'median_error': float(np.median(error)), 'p99_error': float(np.percentile(error, 99)),
+                             'direct_seconds': direct_time, 'tree_seconds': tree_time})
+    return rows
+
+if __name__ == '__main__':
+    print(f"{'scenario':<8} {'N':>7} {'theta':>5} {'median err':>10} {'p99 err':>10} {'direct s':>9} {'tree s':>9}")
+    for row in accuracy_report():
+        print(f"{row['scenario']:<8} {row['bodies']:>7} {row['theta']:>5.2f} {row['median_error']:>10.2e} "
+              f"{row['p99_error']:>10.2e} {row['direct_seconds']:>9.3f} {row['tree_seconds']:>9.3f}")
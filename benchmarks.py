@@ -0,0 +1,244 @@
+"""Performance benchmarks for stepping, collision checks and rendering.
+
+Run `python benchmarks.py --output results.json` to record a baseline, then
+`python benchmarks.py --compare results.json` on another commit to flag regressions.
+`python benchmarks.py --check-imports` fails if a module takes too long to import.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+from solar_system import SolarSystem
+from solar_system_body import SolarSystemBody
+from utilities import AU, G
+
+BODY_COUNTS = (4, 100, 1000, 10000)
+TRAIL_LENGTHS = (0, 100, 1000)
+COLORS = ['blue', 'red', 'green', 'orange', 'purple', 'brown']
+
+# module -> (seconds its import may take in a fresh interpreter, modules it must not load)
+HEAVY_MODULES = ('scipy', 'matplotlib', 'PyQt5', 'regex')
+IMPORT_BUDGETS = {
+    'solar_system': (0.25, HEAVY_MODULES + ('barnes_hut',)),
+    'checkpoint': (0.3, HEAVY_MODULES),
+    'headless': (0.3, HEAVY_MODULES + ('asyncio',)),
+    'ensemble': (0.35, HEAVY_MODULES),
+    'solar_system_app': (0.5, ('scipy', 'matplotlib', 'regex', 'asyncio')),
+}
+
+def make_system(n, seed=0):
+    # A Sun with n - 1 light bodies on circular orbits between 0.5 and 5 AU
+    rng = np.random.default_rng(seed)
+    solar_system = SolarSystem()
+    sun = SolarSystemBody(solar_system, 1.989e+30, 696340000, (0, 0, 0), (0, 0, 0))
+    sun.color = 'yellow'
+    solar_system.add_body(sun)
+    for i in range(n - 1):
+        distance = rng.uniform(0.5, 5) * AU
+        angle = rng.uniform(0, 2 * np.pi)
+        speed = np.sqrt(G * sun.mass / distance)
+        body = SolarSystemBody(solar_system, rng.uniform(1e20, 1e25), 1e6,
+                               (distance * np.cos(angle), distance * np.sin(angle), 0),
+                               (-speed * np.sin(angle), speed * np.cos(angle), 0))
+        body.color = COLORS[i % len(COLORS)]
+        solar_system.add_body(body)
+    return solar_system
+
+def fill_trails(solar_system, length):
+    for _ in range(length):
+        solar_system.trails.record(solar_system.positions)
+
+def time_calls(function, budget):
+    # Call function repeatedly for about budget seconds (at least once) and return seconds per call
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return elapsed / calls, calls
+
+def bench_update_all(n, trail, budget):
+    solar_system = make_system(n)
+    return time_calls(lambda: solar_system.update_all(3600 * 24 * 7), budget)
+
+def bench_advance(n, trail, budget):
+    # Ten steps per call through the multi-step API
+    solar_system = make_system(n)
+    return time_calls(lambda: solar_system.advance(10, 3600 * 24 * 7, sample_every=10), budget)
+
+def bench_particles(n, trail, budget):
+    # update_all with every body but the Sun and nine others as test particles
+    solar_system = make_system(n)
+    solar_system.particles[10:] = True
+    return time_calls(lambda: solar_system.update_all(3600 * 24 * 7), budget)
+
+def bench_direct_threads(workers):
+    # Direct-sum accelerations of every body on `workers` threads (None for every core)
+    def bench(n, trail, budget):
+        solar_system = make_system(n)
+        solar_system.force_backend = 'direct'
+        solar_system.force_workers = workers
+        return time_calls(solar_system.accelerations, budget)
+    return bench
+
+def bench_check_collisions(n, trail, budget):
+    solar_system = make_system(n)
+    return time_calls(solar_system.check_collisions, budget)
+
+def bench_body_draw(n, trail, budget):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    canvas = FigureCanvasAgg(Figure())
+    ax = canvas.figure.add_subplot(111, projection='3d')
+    solar_system = make_system(n)
+    fill_trails(solar_system, trail)
+
+    def draw():
+        ax.clear()
+        for body in solar_system.bodies:
+            body.draw(ax)
+        canvas.draw()
+    return time_calls(draw, budget)
+
+_app = None  # Qt needs its QApplication to outlive every window a benchmark creates
+
+def bench_update_plot(n, trail, budget):
+    global _app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from solar_system_app import SolarSystemApp
+    _app = QApplication.instance() or QApplication(sys.argv)
+    window = SolarSystemApp()
+    window.solarSystem = make_system(n)
+    fill_trails(window.solarSystem, trail)
+    try:
+        return time_calls(window.updatePlot, budget)
+    finally:
+        window.close()
+
+# name -> (function, whether it is swept over trail lengths)
+BENCHMARKS = {
+    'update_all': (bench_update_all, False),
+    'advance': (bench_advance, False),
+    'particles': (bench_particles, False),
+    'direct_1_thread': (bench_direct_threads(1), False),
+    'direct_all_cores': (bench_direct_threads(None), False),
+    'check_collisions': (bench_check_collisions, False),
+    'body_draw': (bench_body_draw, True),
+    'update_plot': (bench_update_plot, True),
+}
+
+def run_benchmarks(names, body_counts, trail_lengths, budget, max_call_seconds):
+    results = []
+    for name in names:
+        function, uses_trails = BENCHMARKS[name]
+        for trail in (trail_lengths if uses_trails else (0,)):
+            too_slow = False
+            for n in body_counts:
+                case = {'name': name, 'bodies': n, 'trail': trail}
+                if too_slow:
+                    # A smaller case already exceeded max_call_seconds, so this one would too
+                    results.append(dict(case, skipped=True))
+                    continue
+                seconds, calls = function(n, trail, budget)
+                results.append(dict(case, seconds_per_call=seconds, calls=calls))
+                print(f"{name:<17} N={n:<6} trail={trail:<5} {seconds * 1e3:10.3f} ms/call ({calls} calls)", file=sys.stderr)
+                too_slow = seconds > max_call_seconds
+    return results
+
+def machine_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def measure_import(module, forbidden, repeats=3):
+    # Best of several fresh interpreters, so one slow disk read does not fail the check
+    code = (f"import sys, time; start = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - start); print(','.join(m for m in {tuple(forbidden)!r} if m in sys.modules))")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (directory, os.environ.get('PYTHONPATH')))))
+    best, loaded = None, ''
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=directory, env=env).stdout.split('\n')
+        seconds = float(output[0])
+        best = seconds if best is None else min(best, seconds)
+        loaded = output[1]
+    return best, [name for name in loaded.split(',') if name]
+
+def check_imports(budgets=IMPORT_BUDGETS):
+    """Print the import time of every budgeted module and return the names of those over budget."""
+    failures = []
+    for module, (budget, forbidden) in budgets.items():
+        seconds, loaded = measure_import(module, forbidden)
+        problems = []
+        if seconds > budget:
+            problems.append(f"over the {budget * 1e3:.0f} ms budget")
+        if loaded:
+            problems.append(f"loads {', '.join(loaded)}")
+        print(f"import {module:<17} {seconds * 1e3:8.1f} ms {'; '.join(problems)}")
+        if problems:
+            failures.append(module)
+    return failures
+
+def case_key(result):
+    return result['name'], result['bodies'], result['trail']
+
+def compare(results, baseline, threshold):
+    """Print the speed ratio of every case present in both runs and return the regressed ones."""
+    previous = {case_key(r): r for r in baseline['results'] if not r.get('skipped')}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None or result.get('skipped'):
+            continue
+        ratio = result['seconds_per_call'] / old['seconds_per_call']
+        flag = 'REGRESSION' if ratio > threshold else ''
+        print(f"{result['name']:<17} N={result['bodies']:<6} trail={result['trail']:<5} {ratio:6.2f}x {flag}")
+        if ratio > threshold:
+            regressions.append(result)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark stepping, collision checks and rendering.")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--bodies', nargs='+', type=int, default=BODY_COUNTS)
+    parser.add_argument('--trails', nargs='+', type=int, default=TRAIL_LENGTHS)
+    parser.add_argument('--budget', type=float, default=1.0, help="Seconds spent timing each case")
+    parser.add_argument('--max-call-seconds', type=float, default=10.0,
+                        help="Skip larger body counts once a single call takes longer than this")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--compare', help="Baseline JSON file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2, help="Slowdown ratio reported as a regression")
+    parser.add_argument('--check-imports', action='store_true',
+                        help="Only check module import times against IMPORT_BUDGETS")
+    args = parser.parse_args(argv)
+
+    if args.check_imports:
+        if check_imports():
+            sys.exit(1)
+        return
+
+    results = run_benchmarks(args.only, args.bodies, args.trails, args.budget, args.max_call_seconds)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'machine': machine_info(), 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Checkpoint files hold the complete state of a SolarSystem:
+
+    preamble   magic b'SSCP', uint16 format version, uint32 header length (little-endian)
+    header     UTF-8 JSON: body count, time, dt, integrator name, options and state, force backend and
+               threads, colors, and the dtype, shape and offset of each array
+    arrays     raw little-endian arrays, each starting on a 64-byte boundary
+
+Arrays are read with np.frombuffer, so loading costs a file read and a copy however many bodies
+there are.
+"""
+import json
+import os
+import struct
+import threading
+import time
+import numpy as np
+from solar_system import SolarSystem
+
+MAGIC = b'SSCP'
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<4sHI')  # magic, format version, header length
+_ALIGN = 64
+_ARRAYS = ('positions', 'velocities', 'masses', 'radii', 'show_trail', 'particles')
+
+def capture(solar_system):
+    """(header, arrays) for a checkpoint of solar_system; the arrays are copies, so the system may keep stepping."""
+    arrays = {
+        'positions': solar_system.positions.astype('<f8'),
+        'velocities': solar_system.velocities.astype('<f8'),
+        'masses': solar_system.masses.astype('<f8'),
+        'radii': solar_system.radii.astype('<f8'),
+        'show_trail': np.array([body.show_trail for body in solar_system.bodies], dtype=np.uint8),
+        'particles': solar_system.particles.astype(np.uint8),
+    }
+    integrator = solar_system.integrator
+    header = {
+        'bodies': len(solar_system.bodies),
+        'time': solar_system.time,
+        'dt': solar_system.dt,
+        'integrator': {'name': integrator.name, 'options': integrator.options(), 'state': integrator.state()},
+        'force_backend': solar_system.force_backend,
+        'theta': solar_system.theta,
+        'force_workers': solar_system.force_workers,
+        'colors': list(solar_system.colors),
+    }
+    return header, arrays
+
+def write_checkpoint(path, header, arrays):
+    # Written to a temporary file and renamed, so a crash mid-write leaves the previous checkpoint intact
+    layout = {}
+    offset = 0
+    for name in _ARRAYS:
+        array = arrays[name]
+        layout[name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    encoded = json.dumps(dict(header, arrays=layout)).encode()
+    start = -(-(_PREAMBLE.size + len(encoded)) // _ALIGN) * _ALIGN
+    encoded = encoded.ljust(start - _PREAMBLE.size)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+        f.write(encoded)
+        for name in _ARRAYS:
+            f.seek(start + layout[name]['offset'])
+            f.write(np.ascontiguousarray(arrays[name]).data)
+        f.truncate(start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+def save_checkpoint(solar_system, path):
+    write_checkpoint(path, *capture(solar_system))
+
+def is_checkpoint(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def read_checkpoint(path):
+    """(header, arrays) from a checkpoint file."""
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    if len(data) < _PREAMBLE.size:
+        raise ValueError(f"{path} is too short to be a checkpoint")
+    magic, version, length = _PREAMBLE.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Unsupported checkpoint format version {version}")
+    start = _PREAMBLE.size + length
+    header = json.loads(data[_PREAMBLE.size:start])
+    arrays = {}
+    for name, entry in header.pop('arrays').items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape']))
+        if start + entry['offset'] + count * dtype.itemsize > len(data):
+            raise ValueError(f"{path} is truncated")
+        arrays[name] = np.frombuffer(data, dtype, count, start + entry['offset']).reshape(entry['shape'])
+    return header, arrays
+
+def load_checkpoint(path):
+    """A new SolarSystem restored from a checkpoint file."""
+    header, arrays = read_checkpoint(path)
+    solar_system = SolarSystem(capacity=max(header['bodies'], 16))
+    particles = arrays['particles'] != 0 if 'particles' in arrays else False  # Absent from older checkpoints
+    solar_system.add_bodies(arrays['positions'], arrays['velocities'], arrays['masses'], arrays['radii'],
+                            header['colors'], particles)
+    # add_bodies shows trails for every body but the test particles; restore any that were toggled
+    show_trail = arrays['show_trail'] != 0
+    for index in np.flatnonzero(show_trail == solar_system.particles):
+        solar_system.bodies[index].show_trail = bool(show_trail[index])
+    solar_system.set_integrator(header['integrator']['name'], **header['integrator']['options'])
+    solar_system.integrator.restore(header['integrator'].get('state', {}))  # Absent from older checkpoints
+    solar_system.time = header['time']
+    solar_system.dt = header['dt']
+    solar_system.force_backend = header['force_backend']
+    solar_system.theta = header['theta']
+    solar_system.force_workers = header.get('force_workers', 1)
+    return solar_system
+
+class CheckpointWriter:
+    """Saves a SolarSystem to `path` every `interval` seconds of wall-clock time.
+
+    The stepping loop calls poll() after each step. When a save is due, poll() copies the state
+    (a few memcpys) and a background thread encodes and writes it, so the loop never waits on
+    the disk. If the previous save is still being written, the new one replaces it in the queue.
+    """
+
+    def __init__(self, path, interval=60.0):
+        self.path = path
+        self.interval = interval
+        self.saved = 0
+        self.error = None  # Last exception raised while writing, if any
+        self._due = time.monotonic() + interval
+        self._pending = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+
+    def poll(self, solar_system):
+        now = time.monotonic()
+        if now >= self._due:
+            self._due = now + self.interval
+            self.submit(solar_system)
+
+    def submit(self, solar_system):
+        # Queue a save of the current state right away
+        with self._lock:
+            self._pending = capture(solar_system)
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            # Keep writing until the queue is empty, so a save submitted mid-write is not lost on close()
+            while True:
+                with self._lock:
+                    pending, self._pending = self._pending, None
+                if pending is None:
+                    break
+                try:
+                    write_checkpoint(self.path, *pending)
+                    self.saved += 1
+                except Exception as e:  # Anything from encoding or the disk; the thread must stay up for later saves
+                    self.error = e
+            if self._stopping:
+                return
+
+    def close(self):
+        # Finish any queued save and stop the thread
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
@@ -0,0 +1,80 @@
+import numpy as np
+
+def find_collisions(positions, radii, max_candidates=1 << 20):
+    """Every pair of overlapping spheres as a (K,2) array of indices (i < j), sorted by i then j.
+
+    Broad phase: sort-and-sweep of the radius intervals along the axis with the largest spread.
+    Narrow phase: a vectorised centre-distance check on the surviving candidate pairs, processed
+    in batches of about max_candidates pairs.
+    """
+    n = len(positions)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    axis = np.argmax(np.ptp(positions, axis=0))
+    lo = positions[:, axis] - radii
+    hi = positions[:, axis] + radii
+    order = np.argsort(lo, kind='stable')
+    lo_sorted = lo[order]
+
+    # In sorted order, body k can only touch bodies k+1 .. end[k]-1, whose intervals start before its own ends
+    end = np.searchsorted(lo_sorted, hi[order], side='right')
+    counts = np.maximum(end - np.arange(n) - 1, 0)
+    total = np.cumsum(counts)
+
+    found = []
+    first = 0
+    while first < n:
+        limit = (total[first - 1] if first else 0) + max_candidates
+        last = max(int(np.searchsorted(total, limit, side='right')), first + 1)
+        batch = np.arange(first, min(last, n))
+        a = np.repeat(batch, counts[batch])
+        b = a + 1 + np.arange(len(a)) - np.repeat(np.cumsum(counts[batch]) - counts[batch], counts[batch])
+        i, j = order[a], order[b]
+        d = positions[i] - positions[j]
+        reach = radii[i] + radii[j]
+        hit = np.einsum('ij,ij->i', d, d) < reach * reach
+        found.append(np.column_stack((np.minimum(i[hit], j[hit]), np.maximum(i[hit], j[hit]))))
+        first = last
+
+    pairs = np.concatenate(found)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+def find_contacts(positions, radii, other_positions, other_radii, max_candidates=1 << 20):
+    """Every overlapping pair between two sets of spheres as a (K,2) array of (index in the first
+    set, index in the second), sorted by the first then the second.
+
+    Pairs within a set are never tested. The second set is sorted along its axis of largest spread
+    and each sphere of the first set is checked against the window of it whose intervals can reach
+    its own, in batches of about max_candidates pairs.
+    """
+    n = len(positions)
+    if n == 0 or len(other_positions) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    axis = np.argmax(np.ptp(other_positions, axis=0))
+    lo = other_positions[:, axis] - other_radii
+    order = np.argsort(lo, kind='stable')
+    lo_sorted = lo[order]
+
+    # An interval of the second set starting before lo - 2 * (its largest radius) ends before lo
+    start = np.searchsorted(lo_sorted, positions[:, axis] - radii - 2 * other_radii.max(), side='left')
+    end = np.searchsorted(lo_sorted, positions[:, axis] + radii, side='right')
+    counts = np.maximum(end - start, 0)
+    total = np.cumsum(counts)
+
+    found = []
+    first = 0
+    while first < n:
+        limit = (total[first - 1] if first else 0) + max_candidates
+        last = max(int(np.searchsorted(total, limit, side='right')), first + 1)
+        batch = np.arange(first, min(last, n))
+        i = np.repeat(batch, counts[batch])
+        k = start[i] + np.arange(len(i)) - np.repeat(np.cumsum(counts[batch]) - counts[batch], counts[batch])
+        j = order[k]
+        d = positions[i] - other_positions[j]
+        reach = radii[i] + other_radii[j]
+        hit = np.einsum('ij,ij->i', d, d) < reach * reach
+        found.append(np.column_stack((i[hit], j[hit])))
+        first = last
+
+    pairs = np.concatenate(found)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
@@ -0,0 +1,214 @@
+"""Run many perturbed copies of one SolarSystem in parallel and summarise how each one ends.
+
+    python ensemble.py scenarios/default.json --steps 5200 --grid 3 mass 1 10 100 --random 1 vy -500 500 --samples 20
+
+The base state is placed in shared memory once, and every worker process builds its members
+from it. Each member writes its metrics into one shared results array, so nothing bulky is
+pickled between processes.
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from solar_system import SolarSystem
+from checkpoint import is_checkpoint, load_checkpoint
+from headless import load_initial_conditions
+from utilities import orbital_elements
+
+# Perturbable quantities: 'mass' multiplies the body's mass, the rest are added to one component
+QUANTITIES = {'mass': None, 'x': ('positions', 0), 'y': ('positions', 1), 'z': ('positions', 2),
+              'vx': ('velocities', 0), 'vy': ('velocities', 1), 'vz': ('velocities', 2)}
+
+# Columns of the shared base state
+_BASE_COLUMNS = 8  # position (3), velocity (3), mass, radius
+
+def make_members(grid=(), random=(), samples=1, seed=0):
+    """The perturbations to run as ((body, quantity) per column, (M, K) array of values).
+
+    grid holds (body, quantity, values) axes, which are combined exhaustively; random holds
+    (body, quantity, low, high) ranges, from which `samples` uniform draws are taken for every
+    grid point.
+    """
+    columns = [(body, quantity) for body, quantity, *_ in list(grid) + list(random)]
+    for body, quantity in columns:
+        if quantity not in QUANTITIES:
+            raise ValueError(f"Unknown quantity: {quantity}")
+    points = np.array(list(itertools.product(*[values for _, _, values in grid])), dtype=np.float64)
+    points = points.reshape(len(points), len(grid))
+    if not random:
+        return columns, points
+    rng = np.random.default_rng(seed)
+    points = np.repeat(points, samples, axis=0)
+    draws = np.column_stack([rng.uniform(low, high, len(points)) for _, _, low, high in random])
+    return columns, np.hstack((points, draws))
+
+def result_dtype(n_bodies, n_parameters):
+    return np.dtype([
+        ('parameters', np.float64, (n_parameters,)),
+        ('collision_time', np.float64),  # Simulated seconds until the first collision, NaN if none
+        ('collision_pair', np.int64, (2,)),  # Bodies in the first collision, -1 if none
+        ('final_time', np.float64),
+        ('semi_major_axis', np.float64, (n_bodies,)),  # Orbital elements about body 0 at final_time
+        ('eccentricity', np.float64, (n_bodies,)),
+        ('inclination', np.float64, (n_bodies,)),
+        ('error', 'U120'),  # Why the member failed, empty if it ran to the end; its other fields are then NaN
+    ])
+
+# Per-process state, set by _attach
+_worker = {}
+
+def _attach(base_name, results_name, shape, config):
+    base_memory = shared_memory.SharedMemory(name=base_name)
+    results_memory = shared_memory.SharedMemory(name=results_name)
+    _worker.update(config)
+    _worker['memory'] = (base_memory, results_memory)  # Keep the mappings alive
+    _worker['base'] = np.ndarray(shape, np.float64, base_memory.buf)
+    _worker['results'] = np.ndarray(config['members'], result_dtype(shape[0], len(config['columns'])), results_memory.buf)
+
+def _build(base, config):
+    solar_system = SolarSystem(capacity=max(len(base), 16))
+    solar_system.add_bodies(base[:, 0:3], base[:, 3:6], base[:, 6], base[:, 7], config['colors'],
+                            np.isin(np.arange(len(base)), config['particles']))
+    solar_system.set_integrator(config['integrator'], **config['integrator_options'])
+    solar_system.dt = config['dt']
+    solar_system.force_backend = config['force_backend']
+    solar_system.theta = config['theta']
+    solar_system.trails.max_bodies = 0  # Nobody looks at ensemble trails
+    return solar_system
+
+def _run_members(members):
+    # A member that fails is marked in its own record, so the rest of the sweep is kept
+    results = _worker['results']
+    for member in members:
+        try:
+            _run_member(member)
+        except Exception as e:
+            result = results[member]
+            for field in ('collision_time', 'final_time', 'semi_major_axis', 'eccentricity', 'inclination'):
+                result[field] = np.nan
+            result['collision_pair'] = -1
+            result['error'] = f"{type(e).__name__}: {e}"
+    return len(members)
+
+def _run_member(member):
+    base, results, config = _worker['base'], _worker['results'], _worker
+    solar_system = _build(base, config)
+    for (body, quantity), value in zip(config['columns'], results[member]['parameters']):
+        if quantity == 'mass':
+            solar_system.masses[body] *= value
+        else:
+            array, axis = QUANTITIES[quantity]
+            getattr(solar_system, array)[body, axis] += value
+    result = results[member]
+    result['collision_time'] = np.nan
+    result['collision_pair'] = -1
+    # Only the final state is needed, so each advance keeps a single frame
+    steps = config['steps']
+    run = solar_system.advance(steps, config['dt'], sample_every=max(steps, 1), stop_on_collision=True)
+    if run.stop_reason == 'collision':
+        result['collision_time'] = solar_system.time
+        result['collision_pair'] = run.collisions[0]
+        if not config['stop_on_collision']:
+            remaining = steps - run.steps
+            solar_system.advance(remaining, config['dt'], sample_every=max(remaining, 1))
+    result['final_time'] = solar_system.time
+    elements = orbital_elements(solar_system.positions, solar_system.velocities, solar_system.masses)
+    result['semi_major_axis'], result['eccentricity'], result['inclination'] = elements
+
+def run_ensemble(solar_system, columns, parameters, steps, dt=None, workers=None, stop_on_collision=True, chunks_per_worker=4):
+    """Run every row of parameters as a perturbation of solar_system for `steps` steps of dt.
+
+    Returns a structured array with one record per member (see result_dtype); a member that
+    raises is recorded with its error rather than stopping the others. solar_system itself is
+    left unchanged.
+    """
+    workers = workers or os.cpu_count()
+    parameters = np.asarray(parameters, dtype=np.float64).reshape(len(parameters), len(columns))
+    n = len(solar_system.bodies)
+    members = len(parameters)
+    dtype = result_dtype(n, len(columns))
+    config = {
+        'columns': list(columns), 'members': members, 'steps': steps, 'dt': dt or solar_system.dt,
+        'integrator': solar_system.integrator.name, 'integrator_options': solar_system.integrator.options(),
+        'force_backend': solar_system.force_backend, 'theta': solar_system.theta,
+        'colors': list(solar_system.colors), 'particles': np.flatnonzero(solar_system.particles).tolist(),
+        'stop_on_collision': stop_on_collision,
+    }
+    base_memory = shared_memory.SharedMemory(create=True, size=max(n * _BASE_COLUMNS * 8, 1))
+    results_memory = shared_memory.SharedMemory(create=True, size=max(members * dtype.itemsize, 1))
+    try:
+        base = np.ndarray((n, _BASE_COLUMNS), np.float64, base_memory.buf)
+        base[:, 0:3] = solar_system.positions
+        base[:, 3:6] = solar_system.velocities
+        base[:, 6] = solar_system.masses
+        base[:, 7] = solar_system.radii
+        results = np.ndarray(members, dtype, results_memory.buf)
+        results['parameters'] = parameters
+        # Several chunks per worker keep every core busy when members finish early after a collision
+        batches = np.array_split(np.arange(members), min(members, workers * chunks_per_worker) or 1)
+        with ProcessPoolExecutor(workers, initializer=_attach,
+                                 initargs=(base_memory.name, results_memory.name, base.shape, config)) as pool:
+            for _ in pool.map(_run_members, [batch.tolist() for batch in batches]):
+                pass
+        output = results.copy()
+        del base, results
+        return output
+    finally:
+        for memory in (base_memory, results_memory):
+            memory.close()
+            memory.unlink()
+
+def summarise(columns, results, file=sys.stdout):
+    labels = [f"{quantity}[{body}]" for body, quantity in columns]
+    print(' '.join(f"{label:>12}" for label in labels), f"{'collision (yr)':>15} {'pair':>7}  max e", file=file)
+    year = 3600 * 24 * 365.25
+    for result in results:
+        values = ' '.join(f"{value:12.4g}" for value in result['parameters'])
+        if result['error']:
+            print(values, f"{'failed':>15}  {result['error']}", file=file)
+            continue
+        pair = '-' if result['collision_pair'][0] < 0 else '{}-{}'.format(*result['collision_pair'])
+        print(values, f"{result['collision_time'] / year:15.3f} {pair:>7}  {np.nanmax(result['eccentricity']):.3f}",
+              file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run perturbed copies of a solar system in parallel.")
+    parser.add_argument('initial_conditions', help="JSON scenario or checkpoint to perturb")
+    parser.add_argument('--steps', type=int, required=True)
+    parser.add_argument('--dt', type=float, help="Time step in seconds (default: the scenario's)")
+    parser.add_argument('--grid', nargs='+', action='append', default=[], metavar='ARG',
+                        help="BODY QUANTITY VALUE...: try every value (mass is a factor, others are offsets)")
+    parser.add_argument('--random', nargs=4, action='append', default=[], metavar=('BODY', 'QUANTITY', 'LOW', 'HIGH'),
+                        help="Draw QUANTITY uniformly from [LOW, HIGH)")
+    parser.add_argument('--samples', type=int, default=10, help="Random draws per grid point")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--keep-going', action='store_true', help="Keep integrating members after a collision")
+    parser.add_argument('--output', default='ensemble.npy', help="Results file (structured .npy array)")
+    args = parser.parse_args(argv)
+    if any(len(axis) < 3 for axis in args.grid):
+        parser.error("--grid needs BODY QUANTITY and at least one VALUE")
+
+    if is_checkpoint(args.initial_conditions):
+        solar_system = load_checkpoint(args.initial_conditions)
+    else:
+        solar_system = load_initial_conditions(args.initial_conditions)
+    grid = [(int(body), quantity, [float(value) for value in values]) for body, quantity, *values in args.grid]
+    random = [(int(body), quantity, float(low), float(high)) for body, quantity, low, high in args.random]
+    columns, parameters = make_members(grid, random, args.samples, args.seed)
+    start = time.perf_counter()
+    results = run_ensemble(solar_system, columns, parameters, args.steps, args.dt, args.workers,
+                           stop_on_collision=not args.keep_going)
+    elapsed = time.perf_counter() - start
+    np.save(args.output, results)
+    summarise(columns, results)
+    failed = np.count_nonzero(results['error'])
+    print(f"{len(results)} members of {args.steps} steps in {elapsed:.2f} s ({failed} failed), wrote {args.output}",
+          file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""Stream body positions from one simulation to many viewers over TCP or a Unix socket.
+
+Every message is a struct '<IB' header (payload length, message type) followed by the payload:
+
+    HELLO     client -> server, JSON {"max_rate": frames per second}; may be sent at any time
+    META      server -> client, JSON {"bodies", "radii", "colors", "particles"}; sent before the first frame
+              and whenever the bodies change
+    KEYFRAME  '<QdI' sequence, simulated time, body count, then float64 (N,3) positions
+    DELTA     '<QdId' sequence, time, body count, scale, then int16 (N,3) steps of `scale` metres
+              from the previous frame sent to that client
+
+Each client gets frames at no more than its own rate. Only the newest frame is ever queued, so a
+slow client skips frames instead of falling behind. Deltas are quantised against what the client
+has reconstructed, so errors do not accumulate; a keyframe is sent when the motion since the last
+frame is too large to quantise within `tolerance` of the system's extent, and every
+`keyframe_interval` frames.
+"""
+import asyncio
+import json
+import struct
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse
+import numpy as np
+from solar_system import SolarSystemSnapshot
+from trails import TrailBuffer
+
+HELLO, META, KEYFRAME, DELTA = range(4)
+_HEADER = struct.Struct('<IB')
+_KEYFRAME = struct.Struct('<QdI')
+_DELTA = struct.Struct('<QdId')
+_QUANTUM = 32767
+
+_Frame = namedtuple('_Frame', ['sequence', 'time', 'positions'])
+
+def parse_address(address):
+    """('tcp', host, port) or ('unix', path, None) from 'tcp://host:port', 'host:port' or 'unix:///path'."""
+    if address.startswith('unix://'):
+        return 'unix', address[len('unix://'):], None
+    parsed = urlparse(address if '://' in address else 'tcp://' + address)
+    if parsed.scheme != 'tcp' or parsed.port is None:
+        raise ValueError(f"Expected tcp://host:port or unix:///path, got {address}")
+    return 'tcp', parsed.hostname or '127.0.0.1', parsed.port
+
+def _message(kind, payload):
+    return _HEADER.pack(len(payload), kind) + payload
+
+class _Client:
+    def __init__(self, max_rate):
+        self.max_rate = max_rate
+        self.event = asyncio.Event()
+        self.next_send = 0.0
+        self.sequence = 0
+        self.meta_version = None
+        self.base = None  # Positions as the client has reconstructed them
+        self.since_keyframe = 0
+
+class FrameServer:
+    """Serves the frames passed to publish() to every connected FrameClient.
+
+    start() runs the asyncio server on its own thread, so publish() and set_bodies() can be
+    called from the simulation loop without blocking it.
+    """
+
+    def __init__(self, address, max_rate=30.0, keyframe_interval=120, tolerance=1e-5):
+        self.address = address
+        self.max_rate = max_rate  # Upper bound on any client's frame rate
+        self.keyframe_interval = keyframe_interval
+        self.tolerance = tolerance  # Largest delta quantisation error, relative to the system's extent
+        self.frames_sent = 0
+        self.frames_skipped = 0  # Frames a client never saw because a newer one replaced them
+        self._latest = None
+        self._sequence = 0
+        self._meta = None
+        self._meta_version = 0
+        self._clients = set()
+        self._loop = None
+        self._notify_pending = False
+        self._ready = threading.Event()
+        self._thread = None
+        self._server = None
+        self.error = None
+
+    def set_bodies(self, radii, colors, particles=None):
+        # particles is a boolean mask of the test particles, listed by index in the message
+        particles = np.flatnonzero(particles).tolist() if particles is not None else []
+        meta = json.dumps({'bodies': len(radii), 'radii': np.asarray(radii).tolist(), 'colors': list(colors),
+                           'particles': particles}).encode()
+        self._meta = _message(META, meta)
+        self._meta_version += 1
+
+    def publish(self, time, positions):
+        self._sequence += 1
+        self._latest = _Frame(self._sequence, float(time), np.array(positions, dtype=np.float64))
+        if self._loop is not None and not self._notify_pending:
+            self._notify_pending = True
+            self._loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        self._notify_pending = False
+        for client in self._clients:
+            client.event.set()
+
+    @property
+    def clients(self):
+        return len(self._clients)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='frame-server', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:  # Reported to start() if it happens while binding
+            self.error = e
+            self._ready.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        kind, host, port = parse_address(self.address)
+        if kind == 'unix':
+            self._server = await asyncio.start_unix_server(self._handle, host)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        self._ready.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive() and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            for client in list(self._clients):
+                self._loop.call_soon_threadsafe(client.event.set)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    async def _listen(self, reader, client):
+        # Apply HELLO messages (rate requests) for as long as the client is connected
+        while True:
+            length, kind = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+            payload = await reader.readexactly(length)
+            if kind == HELLO:
+                rate = float(json.loads(payload).get('max_rate') or self.max_rate)
+                client.max_rate = min(max(rate, 0.1), self.max_rate)
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        client = _Client(self.max_rate)
+        self._clients.add(client)
+        listener = asyncio.ensure_future(self._listen(reader, client))
+        client.event.set()
+        try:
+            while not listener.done() and self._server.is_serving():
+                await client.event.wait()
+                client.event.clear()
+                wait = client.next_send - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                # Whatever was published while waiting has replaced older frames
+                frame = self._latest
+                if frame is None or frame.sequence == client.sequence or self._meta is None:
+                    continue
+                if client.meta_version != self._meta_version:
+                    writer.write(self._meta)
+                    client.meta_version = self._meta_version
+                    client.base = None
+                if client.sequence:
+                    self.frames_skipped += frame.sequence - client.sequence - 1
+                writer.write(self._encode(client, frame))
+                client.sequence = frame.sequence
+                client.next_send = loop.time() + 1 / client.max_rate
+                self.frames_sent += 1
+                await writer.drain()
+                if self._latest is not frame:
+                    client.event.set()
+        except (ConnectionError, OSError, asyncio.CancelledError):  # Cancelled when the server shuts down
+            pass
+        finally:
+            self._clients.discard(client)
+            listener.cancel()
+            writer.close()
+
+    def _encode(self, client, frame):
+        positions = frame.positions
+        n = len(positions)
+        if client.base is not None and len(client.base) == n and client.since_keyframe < self.keyframe_interval:
+            difference = positions - client.base
+            largest = np.abs(difference).max() if n else 0.0
+            scale = largest / _QUANTUM if largest > 0 else 1.0
+            extent = np.abs(positions).max() if n else 0.0
+            if scale / 2 <= self.tolerance * extent:
+                steps = np.rint(difference / scale).astype('<i2')
+                client.base = client.base + steps * scale
+                client.since_keyframe += 1
+                return _message(DELTA, _DELTA.pack(frame.sequence, frame.time, n, scale) + steps.tobytes())
+        client.base = positions
+        client.since_keyframe = 0
+        return _message(KEYFRAME, _KEYFRAME.pack(frame.sequence, frame.time, n) + positions.astype('<f8').tobytes())
+
+class FrameClient:
+    """Receives frames from a FrameServer on a background thread.
+
+    `latest` holds the newest frame as a SolarSystemSnapshot, with trails kept locally, so it can
+    be drawn like a snapshot from a SimulationWorker.
+    """
+
+    def __init__(self, address, max_rate=30.0):
+        self.address = address
+        self.max_rate = max_rate
+        self.latest = None
+        self.frames = 0
+        self.meta_version = 0  # Counts META messages, so viewers know when to rebuild
+        self.connected = False
+        self.error = None  # Why the connection ended, if it failed
+        self.trails = TrailBuffer()
+        self._radii = np.zeros(0)
+        self._colors = []
+        self._particles = None
+        self._positions = None
+        self._loop = None
+        self._task = None
+        self._writer = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='frame-client', daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            asyncio.run(self._receive())
+        except asyncio.CancelledError:
+            pass
+        except asyncio.IncompleteReadError as e:
+            if e.partial:  # The server went away part way through a message
+                self.error = e
+        except (OSError, ValueError) as e:
+            self.error = e
+        finally:
+            self.connected = False
+
+    async def _receive(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        kind, host, port = parse_address(self.address)
+        if kind == 'unix':
+            reader, writer = await asyncio.open_unix_connection(host)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        self._writer = writer
+        self.connected = True
+        self._send_hello()
+        try:
+            while True:
+                length, kind = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                self._handle(kind, await reader.readexactly(length))
+        finally:
+            self._writer = None
+            writer.close()
+
+    def _handle(self, kind, payload):
+        if kind == META:
+            meta = json.loads(payload)
+            self._radii = np.array(meta['radii'], dtype=np.float64)
+            self._colors = meta['colors']
+            self._particles = None
+            if meta.get('particles'):
+                self._particles = np.zeros(meta['bodies'], dtype=bool)
+                self._particles[meta['particles']] = True
+            self._positions = None
+            self.trails = TrailBuffer()
+            self.meta_version += 1
+            return
+        if kind == KEYFRAME:
+            sequence, time, n = _KEYFRAME.unpack_from(payload)
+            self._positions = np.frombuffer(payload, '<f8', n * 3, _KEYFRAME.size).reshape(n, 3).copy()
+        elif kind == DELTA:
+            sequence, time, n, scale = _DELTA.unpack_from(payload)
+            if self._positions is None or len(self._positions) != n:
+                return
+            steps = np.frombuffer(payload, '<i2', n * 3, _DELTA.size).reshape(n, 3)
+            self._positions = self._positions + steps * scale
+        else:
+            return
+        if len(self._positions) != len(self._radii):
+            return
+        self.trails.record(self._positions)
+        particles = self._particles
+        shown = np.arange(self.trails.bodies)
+        if particles is not None:
+            shown = shown[~particles[:len(shown)]]
+        trails = [None] * len(self._positions)
+        for i, trail in zip(shown.tolist(), self.trails.points_of(shown)):
+            trails[i] = trail
+        self.latest = SolarSystemSnapshot(time, self._positions, self._radii, self._colors, trails, particles)
+        self.frames += 1
+
+    def set_max_rate(self, max_rate):
+        self.max_rate = max_rate
+        if self.running and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._send_hello)
+
+    def _send_hello(self):
+        if self._writer is not None:
+            self._writer.write(_message(HELLO, json.dumps({'max_rate': self.max_rate}).encode()))
+
+    def close(self):
+        if self.running and self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
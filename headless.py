@@ -0,0 +1,155 @@
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from solar_system import AdvanceResult, SolarSystem
+from solar_system_body import SolarSystemBody
+from integrators import INTEGRATORS
+from trajectory import TrajectoryRecorder
+from profiling import PhaseProfiler
+from checkpoint import CheckpointWriter, is_checkpoint, load_checkpoint, save_checkpoint
+
+def load_initial_conditions(path):
+    """Build a SolarSystem from a JSON file of the form {"bodies": [{"mass", "radius", "position", "velocity", "color"}, ...]}."""
+    with open(path) as f:
+        data = json.load(f)
+    solar_system = SolarSystem()
+    for entry in data['bodies']:
+        body = SolarSystemBody(solar_system, entry['mass'], entry['radius'], entry['position'], entry['velocity'])
+        body.color = entry.get('color')
+        solar_system.add_body(body)
+    return solar_system
+
+def run(solar_system, dt, steps, output_every=1, recorder=None, checkpoints=None, stop_on_collision=False,
+        max_energy_drift=None, batch_frames=1024, server=None, sim_rate=None):
+    """Advance solar_system by steps of dt, keeping the state of every output_every-th step.
+
+    Returns an AdvanceResult covering the whole run. Steps are taken through SolarSystem.advance
+    in batches of batch_frames frames; with a recorder each batch is streamed to disk instead of
+    kept, so a long run need not fit in memory. With a CheckpointWriter, the state is saved
+    periodically in the background. With a FrameServer, saved frames are published as they are
+    computed, at most max_rate times a second, and sim_rate (simulated seconds per wall-clock
+    second) paces the run for viewers.
+    """
+    n = len(solar_system.bodies)
+    kept = 0 if recorder is not None else steps // output_every + 1
+    times = np.empty(kept)
+    positions = np.empty((kept, n, 3))
+    velocities = np.empty((kept, n, 3))
+    reference_energy = solar_system.total_energy() if max_energy_drift is not None else None
+    batch = batch_frames * output_every if server is None else output_every
+    if server is not None:
+        server.set_bodies(solar_system.radii, solar_system.colors, solar_system.particles)
+    start_time, wall_start = solar_system.time, time.perf_counter()
+    published = 0.0
+    frames = taken = 0
+    result = None
+    while taken < steps and (result is None or result.stop_reason == 'steps'):
+        result = solar_system.advance(min(steps - taken, batch), dt, output_every,
+                                      stop_on_collision, max_energy_drift, reference_energy)
+        taken += result.steps
+        if server is not None:
+            now = time.perf_counter()
+            if now - published >= 1 / server.max_rate:
+                server.publish(solar_system.time, solar_system.positions)
+                published = now
+            if sim_rate:
+                ahead = (solar_system.time - start_time) / sim_rate - (time.perf_counter() - wall_start)
+                if ahead > 0:
+                    time.sleep(ahead)
+        if recorder is not None:
+            recorder.record_frames(solar_system, result.times, result.positions, result.velocities)
+        else:
+            count = len(result.times)
+            times[frames:frames + count] = result.times
+            positions[frames:frames + count] = result.positions
+            velocities[frames:frames + count] = result.velocities
+            frames += count
+        if checkpoints is not None:
+            checkpoints.poll(solar_system)
+    if server is not None:
+        server.publish(solar_system.time, solar_system.positions)
+    stop_reason, collisions = (result.stop_reason, result.collisions) if result else ('steps', np.empty((0, 2), dtype=np.int64))
+    return AdvanceResult(times[:frames], positions[:frames], velocities[:frames], taken, stop_reason, collisions)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a solar system simulation without the GUI.")
+    parser.add_argument('initial_conditions',
+                        help="JSON file describing the bodies (see scenarios/default.json), or a checkpoint to resume")
+    parser.add_argument('--dt', type=float, help="Time step in seconds (default: one week, or the checkpoint's)")
+    parser.add_argument('--integrator', choices=sorted(INTEGRATORS),
+                        help="Integrator (default: rk4, or the checkpoint's)")
+    parser.add_argument('--steps', type=int, required=True, help="Number of steps to integrate")
+    parser.add_argument('--output-every', type=int, default=1, help="Save every n-th step")
+    parser.add_argument('--output', default='trajectory.npz', help="Output .npz file")
+    parser.add_argument('--record', metavar='DIR',
+                        help="Stream frames to memory-mapped chunks in DIR instead of writing --output; open DIR with Controls > Open Replay")
+    parser.add_argument('--checkpoint', metavar='PATH', help="Save the state to PATH periodically and at the end")
+    parser.add_argument('--checkpoint-interval', type=float, default=60.0, help="Seconds between checkpoints")
+    parser.add_argument('--stop-on-collision', action='store_true', help="Stop after the first step where bodies overlap")
+    parser.add_argument('--profile', metavar='PATH', help="Time each phase and write a JSON (or .csv) summary to PATH")
+    parser.add_argument('--max-energy-drift', type=float,
+                        help="Stop once the relative change in total energy exceeds this (checked at every saved step)")
+    parser.add_argument('--force-workers', type=int,
+                        help="Threads for direct-sum gravity (0 = every core; default: 1, or the checkpoint's)")
+    parser.add_argument('--serve', metavar='ADDRESS',
+                        help="Stream frames to viewers at tcp://host:port or unix:///path (Controls > Connect to Stream)")
+    parser.add_argument('--serve-rate', type=float, default=30.0, help="Most frames per second sent to each viewer")
+    parser.add_argument('--sim-rate', type=float,
+                        help="Simulated seconds per wall-clock second, to pace a served run (default: as fast as possible)")
+    args = parser.parse_args(argv)
+
+    if is_checkpoint(args.initial_conditions):
+        solar_system = load_checkpoint(args.initial_conditions)
+    else:
+        solar_system = load_initial_conditions(args.initial_conditions)
+    if args.integrator:
+        solar_system.set_integrator(args.integrator)
+    if args.force_workers is not None:
+        solar_system.force_workers = args.force_workers or None
+    dt = args.dt or solar_system.dt
+    if args.profile:
+        solar_system.profiler = PhaseProfiler()
+    solar_system.dt = dt
+    recorder = TrajectoryRecorder(args.record) if args.record else None
+    checkpoints = CheckpointWriter(args.checkpoint, args.checkpoint_interval) if args.checkpoint else None
+    server = None
+    if args.serve:
+        from frame_server import FrameServer  # Pulls in asyncio, which plain runs never need
+        server = FrameServer(args.serve, args.serve_rate)
+        server.start()
+    start = time.perf_counter()
+    try:
+        result = run(solar_system, dt, args.steps, args.output_every, recorder, checkpoints,
+                     args.stop_on_collision, args.max_energy_drift, server=server, sim_rate=args.sim_rate)
+    except FloatingPointError as e:
+        sys.exit(f"Integration failed at t = {solar_system.time:g} s: {e}")
+    finally:
+        if server is not None:
+            server.close()
+        if recorder is not None:
+            recorder.close()
+        if checkpoints is not None:
+            checkpoints.close()
+    if args.checkpoint:
+        save_checkpoint(solar_system, args.checkpoint)
+    elapsed = time.perf_counter() - start
+    if recorder is not None:
+        frames, output = sum(chunk['frames'] for chunk in recorder.chunks), args.record
+    else:
+        np.savez(args.output, times=result.times, positions=result.positions, velocities=result.velocities,
+                 masses=solar_system.masses)
+        frames, output = len(result.times), args.output
+    if args.profile:
+        solar_system.profiler.gauge('bodies', len(solar_system.bodies))
+        solar_system.profiler.export(args.profile)
+    if result.stop_reason == 'collision':
+        print(f"Stopped after step {result.steps}: bodies {result.collisions.tolist()} collided", file=sys.stderr)
+    elif result.stop_reason == 'energy':
+        print(f"Stopped after step {result.steps}: energy drift exceeded {args.max_energy_drift}", file=sys.stderr)
+    print(f"{result.steps} steps of {len(solar_system.bodies)} bodies in {elapsed:.2f} s "
+          f"({result.steps / elapsed:.1f} steps/s), wrote {frames} frames to {output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
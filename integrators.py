@@ -0,0 +1,347 @@
+import numpy as np
+from gravity import DirectSumWorkspace
+
+class Integrator:
+    """Advances every body of a SolarSystem together by one step of dt.
+
+    Subclasses implement step(). With dtype=np.float32 the force evaluation runs in single
+    precision while the state itself stays in float64.
+    """
+
+    name = None
+
+    def __init__(self, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.workspace = DirectSumWorkspace(self.dtype)
+        self._size = None
+
+    def step(self, system, dt):
+        raise NotImplementedError
+
+    def options(self):
+        # Keyword arguments that recreate this integrator through make_integrator
+        return {'dtype': self.dtype.name}
+
+    def state(self):
+        # JSON-serialisable values carried between steps, which a checkpoint must save for a run to resume exactly
+        return {}
+
+    def restore(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def _allocate(self, n):
+        self._size = n
+        self._acceleration = np.empty((n, 3), dtype=self.dtype)
+
+    def _accelerations(self, system, positions):
+        return system.accelerations(positions, out=self._acceleration, workspace=self.workspace)
+
+    def _force_inputs(self, system):
+        # Everything besides positions that accelerations depend on, for integrators that cache them between steps
+        return (system.masses.tobytes(), system.particles.tobytes(), system.force_backend, system.theta,
+                system.force_workers)
+
+class RK4Integrator(Integrator):
+    """Classic fourth-order Runge-Kutta.
+
+    All bodies go through each stage at the same time, so no body sees a half-advanced neighbour.
+    """
+
+    name = 'rk4'
+
+    def _allocate(self, n):
+        super()._allocate(n)
+        self._stage_positions = np.empty((n, 3))
+        self._stage_velocities = np.empty((n, 3))
+        self._position_sum = np.empty((n, 3))
+        self._velocity_sum = np.empty((n, 3))
+
+    def step(self, system, dt):
+        x = system.positions
+        v = system.velocities
+        if len(x) == 0:
+            return
+        if self._size != len(x):
+            self._allocate(len(x))
+        xs, vs = self._stage_positions, self._stage_velocities
+        dx, dv = self._position_sum, self._velocity_sum
+
+        a = self._accelerations(system, x)
+        dx[:] = v
+        dv[:] = a
+
+        # Stages 2 and 3 are evaluated at the midpoint and weighted twice
+        stage_velocity = v
+        for _ in range(2):
+            np.multiply(stage_velocity, 0.5 * dt, out=xs)
+            xs += x
+            np.multiply(a, 0.5 * dt, out=vs)
+            vs += v
+            a = self._accelerations(system, xs)
+            dx += vs
+            dx += vs
+            dv += a
+            dv += a
+            stage_velocity = vs
+
+        np.multiply(vs, dt, out=xs)
+        xs += x
+        np.multiply(a, dt, out=vs)
+        vs += v
+        a = self._accelerations(system, xs)
+        dx += vs
+        dv += a
+
+        np.multiply(dx, dt / 6, out=dx)
+        np.multiply(dv, dt / 6, out=dv)
+        x += dx
+        v += dv
+
+class LeapfrogIntegrator(Integrator):
+    """Second-order symplectic kick-drift-kick leapfrog (velocity Verlet).
+
+    The closing acceleration of one step is reused as the opening one of the next, so a step
+    costs a single force evaluation unless positions, masses or force settings were changed in
+    between.
+    """
+
+    name = 'leapfrog'
+
+    def _allocate(self, n):
+        super()._allocate(n)
+        self._cached_positions = None
+        self._cached_inputs = None
+
+    def _opening_accelerations(self, system):
+        x = system.positions
+        if (self._cached_positions is None or not np.array_equal(self._cached_positions, x)
+                or self._cached_inputs != self._force_inputs(system)):
+            self._accelerations(system, x)
+        return self._acceleration
+
+    def step(self, system, dt):
+        x = system.positions
+        v = system.velocities
+        if len(x) == 0:
+            return
+        if self._size != len(x):
+            self._allocate(len(x))
+        a = self._opening_accelerations(system)
+        v += 0.5 * dt * a
+        x += dt * v
+        a = self._accelerations(system, x)
+        v += 0.5 * dt * a
+        self._cached_positions = x.copy()
+        self._cached_inputs = self._force_inputs(system)
+
+class Yoshida4Integrator(Integrator):
+    """Fourth-order symplectic Yoshida composition of three drift-kick-drift leapfrog steps."""
+
+    name = 'yoshida4'
+
+    _W1 = 1 / (2 - 2**(1 / 3))
+    _W0 = -2**(1 / 3) / (2 - 2**(1 / 3))
+    DRIFTS = (_W1 / 2, (_W0 + _W1) / 2, (_W0 + _W1) / 2, _W1 / 2)
+    KICKS = (_W1, _W0, _W1)
+
+    def step(self, system, dt):
+        x = system.positions
+        v = system.velocities
+        if len(x) == 0:
+            return
+        if self._size != len(x):
+            self._allocate(len(x))
+        for drift, kick in zip(self.DRIFTS, self.KICKS):
+            x += drift * dt * v
+            v += kick * dt * self._accelerations(system, x)
+        x += self.DRIFTS[-1] * dt * v
+
+class RK45Integrator(Integrator):
+    """Embedded Dormand-Prince 5(4) Runge-Kutta with error-controlled adaptive substeps.
+
+    step() always advances exactly dt, but splits it into as many substeps as the local error
+    estimate requires. The substep size carries over between calls, so smooth stretches of an
+    orbit are crossed in a single substep.
+    """
+
+    name = 'rk45'
+
+    A = (
+        (),
+        (1 / 5,),
+        (3 / 40, 9 / 40),
+        (44 / 45, -56 / 15, 32 / 9),
+        (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+        (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+        (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+    )
+    B5 = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+    B4 = np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+    def __init__(self, rtol=1e-8, atol=1e-3, dtype=np.float64):
+        super().__init__(dtype)
+        self.rtol = rtol
+        self.atol = atol  # Absolute tolerance in metres and metres per second
+        self.substep = None  # Last accepted substep size, reused as the next first guess
+        self.rejected = 0
+
+    def options(self):
+        return dict(super().options(), rtol=self.rtol, atol=self.atol)
+
+    def state(self):
+        return {'substep': self.substep, 'rejected': self.rejected}
+
+    def _allocate(self, n):
+        super()._allocate(n)
+        self._kx = np.empty((7, n, 3))
+        self._kv = np.empty((7, n, 3))
+
+    def step(self, system, dt):
+        x = system.positions
+        v = system.velocities
+        if len(x) == 0:
+            return
+        if self._size != len(x):
+            self._allocate(len(x))
+        x_start, v_start = x.copy(), v.copy()  # Restored if the step fails, so the state still matches the clock
+        remaining = dt
+        min_substep = 1e-12 * dt
+        h = min(self.substep or dt, dt)
+        while remaining > min_substep:
+            trial = min(h, remaining)
+            x_new, v_new, error = self._attempt(system, x, v, trial)
+            if not np.isfinite(error):
+                factor = 0.2  # The trial overflowed; shrink as fast as allowed
+            else:
+                factor = min(5.0, max(0.2, 0.9 * error**-0.2)) if error > 0 else 5.0
+            if error <= 1:
+                x[:] = x_new
+                v[:] = v_new
+                remaining -= trial
+                # A substep cut short to land on dt says nothing about the size the orbit allows
+                h = max(h, trial * factor) if trial < h else trial * factor
+            else:
+                self.rejected += 1
+                h = trial * factor
+                if h < min_substep:
+                    x[:] = x_start
+                    v[:] = v_start
+                    self.substep = None
+                    raise FloatingPointError(f"rk45 substep fell below {min_substep:g} s without meeting the error "
+                                             f"tolerance (error {error:g}); bodies are probably too close")
+        self.substep = h
+
+    def _attempt(self, system, x, v, h):
+        kx, kv = self._kx, self._kv
+        for i, row in enumerate(self.A):
+            xs = x + h * np.tensordot(row, kx[:len(row)], axes=1) if row else x
+            vs = v + h * np.tensordot(row, kv[:len(row)], axes=1) if row else v
+            kx[i] = vs
+            kv[i] = self._accelerations(system, xs)
+        x_new = x + h * np.tensordot(self.B5, kx, axes=1)
+        v_new = v + h * np.tensordot(self.B5, kv, axes=1)
+        weights = self.B5 - self.B4
+        x_error = np.linalg.norm(h * np.tensordot(weights, kx, axes=1), axis=1)
+        v_error = np.linalg.norm(h * np.tensordot(weights, kv, axes=1), axis=1)
+        x_scale = self.atol + self.rtol * np.maximum(np.linalg.norm(x, axis=1), np.linalg.norm(x_new, axis=1))
+        v_scale = self.atol + self.rtol * np.maximum(np.linalg.norm(v, axis=1), np.linalg.norm(v_new, axis=1))
+        error = max((x_error / x_scale).max(), (v_error / v_scale).max())
+        return x_new, v_new, error
+
+class BlockTimestepIntegrator(Integrator):
+    """Kick-drift-kick leapfrog with individual power-of-two time-steps per body (block time-steps).
+
+    Each call advances every body by dt, in body steps of dt / 2**level. A body's level is the
+    coarsest one whose step is at most `eta` times its dynamical time |v|/|a| (velocity relative to
+    the centre of mass), capped at max_level. At each sub-tick only the bodies whose steps end are
+    given new forces, with all bodies as sources; the rest just drift. A level may get finer at
+    the end of any step but coarser only where the coarser grid lines up, and every body is back
+    in step at the end of dt.
+    """
+
+    name = 'block'
+
+    def __init__(self, eta=0.01, max_level=10, dtype=np.float64):
+        super().__init__(dtype)
+        self.eta = eta
+        self.max_level = max_level
+        self.levels = np.zeros(0, dtype=np.int64)
+        self.evaluations = 0  # Single-body force evaluations so far
+
+    def options(self):
+        return dict(super().options(), eta=self.eta, max_level=self.max_level)
+
+    def state(self):
+        return {'evaluations': self.evaluations}
+
+    def _allocate(self, n):
+        super()._allocate(n)
+        self._a = np.zeros((n, 3))
+        self._cached_positions = None
+        self._cached_inputs = None
+
+    def _choose_levels(self, dt, a, v):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau = np.linalg.norm(v, axis=1) / np.linalg.norm(a, axis=1)
+            levels = np.ceil(np.log2(dt / (self.eta * tau)))
+        levels = np.nan_to_num(levels, nan=0.0, posinf=self.max_level, neginf=0.0)
+        return np.clip(levels, 0, self.max_level).astype(np.int64)
+
+    def step(self, system, dt):
+        x = system.positions
+        v = system.velocities
+        n = len(x)
+        if n == 0:
+            return
+        if self._size != n:
+            self._allocate(n)
+        a = self._a
+        masses = system.masses
+        if (self._cached_positions is None or not np.array_equal(self._cached_positions, x)
+                or self._cached_inputs != self._force_inputs(system)):
+            a[:] = self._accelerations(system, x)
+            self.evaluations += n
+        total_mass = masses.sum()
+        v_com = masses @ v / total_mass if total_mass > 0 else np.zeros(3)
+
+        ticks = 1 << self.max_level
+        h = dt / ticks
+        levels = self._choose_levels(dt, a, v - v_com)
+        strides = ticks >> levels  # Sub-ticks per body step
+        v += 0.5 * h * strides[:, None] * a
+        drifted = tick = 0
+        while tick < ticks:
+            # Strides are powers of two, so the next step to end is on the next multiple of the smallest
+            finest = int(strides.min())
+            tick += finest - tick % finest
+            # Velocities only change at force evaluations, so drifting can wait until one is needed
+            x += (tick - drifted) * h * v
+            drifted = tick
+            active = np.flatnonzero(tick % strides == 0)
+            a[active] = system.accelerations(x, out=self._acceleration[:len(active)], workspace=self.workspace,
+                                             targets=active)
+            self.evaluations += len(active)
+            v[active] += 0.5 * h * strides[active, None] * a[active]
+            if tick == ticks:
+                break
+            new = self._choose_levels(dt, a[active], v[active] - v_com)
+            aligned = tick % (ticks >> new) == 0
+            new = np.where((new < levels[active]) & ~aligned, levels[active], new)
+            levels[active] = new
+            strides[active] = ticks >> new
+            v[active] += 0.5 * h * strides[active, None] * a[active]
+        self.levels = levels
+        self._cached_positions = x.copy()
+        self._cached_inputs = self._force_inputs(system)
+
+INTEGRATORS = {cls.name: cls for cls in (RK4Integrator, LeapfrogIntegrator, Yoshida4Integrator, RK45Integrator,
+                                         BlockTimestepIntegrator)}
+
+def make_integrator(name, **options):
+    """Create an integrator by name: 'rk4', 'leapfrog', 'yoshida4', 'rk45' or 'block'."""
+    try:
+        cls = INTEGRATORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown integrator: {name}") from None
+    return cls(**options)
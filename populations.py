@@ -0,0 +1,108 @@
+"""Bulk body sets: procedural belts, rings and debris clouds, and loaders for CSV/NPY files.
+
+Every function returns a Population, whose fields match the arguments of SolarSystem.add_bodies:
+
+    solar_system.add_bodies(*asteroid_belt(solar_system, 0, 100000, particles=True))
+"""
+from collections import namedtuple
+import numpy as np
+from utilities import AU, circular_orbit_velocities
+
+Population = namedtuple('Population', ['positions', 'velocities', 'masses', 'radii', 'colors', 'particles'],
+                        defaults=(False,))
+
+# Columns of a body file, in the order used by NPY files without field names
+COLUMNS = ('mass', 'radius', 'x', 'y', 'z', 'vx', 'vy', 'vz')
+
+def _masses_and_radii(rng, count, mass_range, density):
+    # Masses log-uniform over mass_range; radii of uniform spheres of that density
+    masses = np.exp(rng.uniform(np.log(mass_range[0]), np.log(mass_range[1]), count))
+    radii = np.cbrt(3 * masses / (4 * np.pi * density))
+    return masses, radii
+
+def _circular_population(solar_system, central, count, inner, outer, max_inclination, mass_range, density, color,
+                         particles, seed):
+    # Circular orbits spread evenly over the annulus [inner, outer], tilted up to max_inclination
+    rng = np.random.default_rng(seed)
+    distance = np.sqrt(rng.uniform(inner**2, outer**2, count))  # Uniform per unit area
+    angle = rng.uniform(0, 2 * np.pi, count)
+    inclination = rng.uniform(0, max_inclination, count)
+    node = rng.uniform(0, 2 * np.pi, count)
+    line_of_nodes = np.column_stack((np.cos(node), np.sin(node), np.zeros(count)))
+    normals = np.column_stack((np.sin(inclination) * np.sin(node), -np.sin(inclination) * np.cos(node),
+                               np.cos(inclination)))
+    in_plane = np.cross(normals, line_of_nodes)
+    offsets = distance[:, None] * (np.cos(angle)[:, None] * line_of_nodes + np.sin(angle)[:, None] * in_plane)
+    body = solar_system.bodies[central]
+    velocities = body.velocity + circular_orbit_velocities(body.mass, offsets, normals)
+    masses, radii = _masses_and_radii(rng, count, mass_range, density)
+    return Population(body.position + offsets, velocities, masses, radii, color, particles)
+
+def asteroid_belt(solar_system, central, count, inner=2.1 * AU, outer=3.3 * AU, max_inclination=np.radians(10),
+                  mass_range=(1e12, 1e18), density=2000.0, color='gray', particles=False, seed=None):
+    """Asteroids on circular orbits about body `central`, between inner and outer metres from it."""
+    return _circular_population(solar_system, central, count, inner, outer, max_inclination,
+                                mass_range, density, color, particles, seed)
+
+def ring(solar_system, central, count, inner=None, outer=None, mass_range=(1e3, 1e9), density=900.0,
+         color='lightgray', particles=False, seed=None):
+    """A flat ring of small particles about body `central`, by default from 1.5 to 2.5 times its radius."""
+    radius = solar_system.bodies[central].radius
+    inner = 1.5 * radius if inner is None else inner
+    outer = 2.5 * radius if outer is None else outer
+    return _circular_population(solar_system, central, count, inner, outer, 0.0, mass_range, density, color,
+                                particles, seed)
+
+def debris_cloud(solar_system, central, count, inner=None, outer=None, velocity_dispersion=0.05,
+                 mass_range=(1e6, 1e14), density=2500.0, color='brown', particles=False, seed=None):
+    """Debris scattered through a spherical shell about body `central`, on randomly oriented near-circular orbits.
+
+    The shell defaults to 2 to 10 times the body's radius; velocity_dispersion is the spread of the
+    speeds as a fraction of the circular speed. With particles=True, every generator returns test
+    particles, which feel the existing bodies' gravity but exert none.
+    """
+    rng = np.random.default_rng(seed)
+    body = solar_system.bodies[central]
+    inner = 2 * body.radius if inner is None else inner
+    outer = 10 * body.radius if outer is None else outer
+    directions = rng.normal(size=(count, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    distance = np.cbrt(rng.uniform(inner**3, outer**3, count))  # Uniform per unit volume
+    offsets = directions * distance[:, None]
+    # A random orbit normal perpendicular to each offset
+    normals = np.cross(directions, rng.normal(size=(count, 3)))
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    velocities = circular_orbit_velocities(body.mass, offsets, normals)
+    velocities *= 1 + velocity_dispersion * rng.standard_normal(count)[:, None]
+    masses, radii = _masses_and_radii(rng, count, mass_range, density)
+    return Population(body.position + offsets, body.velocity + velocities, masses, radii, color, particles)
+
+def load_bodies(path):
+    """Read bodies from a .npy or .csv file in SI units.
+
+    CSV files need a header naming the columns mass, radius, x, y, z, vx, vy, vz, plus optional
+    color and particle (1 for a test particle) columns. NPY files hold either a structured array
+    with those fields or a plain (N, 8) array with the columns in that order.
+    """
+    if path.lower().endswith('.npy'):
+        data = np.load(path)
+        if data.dtype.names is None:
+            data = np.atleast_2d(data)
+            if data.shape[1] != len(COLUMNS):
+                raise ValueError(f"Expected {len(COLUMNS)} columns ({', '.join(COLUMNS)}), got {data.shape[1]}")
+            columns = dict(zip(COLUMNS, data.T))
+        else:
+            columns = {name: data[name] for name in data.dtype.names}
+    else:
+        data = np.atleast_1d(np.genfromtxt(path, delimiter=',', names=True, dtype=None, encoding='utf-8'))
+        columns = {name.lower(): data[name] for name in data.dtype.names}
+    colors = columns.get('color')
+    missing = [name for name in COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"{path} has no {', '.join(missing)} column")
+    positions = np.column_stack([columns[name].astype(np.float64) for name in ('x', 'y', 'z')])
+    velocities = np.column_stack([columns[name].astype(np.float64) for name in ('vx', 'vy', 'vz')])
+    colors = [str(color) for color in colors] if colors is not None else None
+    particles = columns['particle'].astype(bool) if 'particle' in columns else False
+    return Population(positions, velocities, columns['mass'].astype(np.float64),
+                      columns['radius'].astype(np.float64), colors, particles)
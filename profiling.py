@@ -0,0 +1,118 @@
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# Histogram bin edges in seconds, log-spaced from 1 microsecond to 10 seconds
+BIN_EDGES = np.logspace(-6, 1, 29)
+
+class _Ring:
+    # The last `size` values pushed, with the wall-clock time of each
+    def __init__(self, size):
+        self.values = np.zeros(size)
+        self.stamps = np.zeros(size)
+        self.count = 0
+
+    def push(self, value, stamp):
+        slot = self.count % len(self.values)
+        self.values[slot] = value
+        self.stamps[slot] = stamp
+        self.count += 1
+
+    def recent(self):
+        n = min(self.count, len(self.values))
+        return self.values[:n], self.stamps[:n]
+
+class PhaseProfiler:
+    """Rolling timings of named phases (physics, collisions, trails, draw, ...) plus counters and gauges.
+
+    Each phase keeps its last `window` durations, from which summary() derives means, percentiles
+    and a log-scale histogram. count() records events such as steps or frames, reported as rates
+    over the same window; gauge() keeps the latest value of a quantity such as the body count.
+    Code being profiled holds a profiler reference that is None when profiling is off, so the
+    disabled cost is one comparison per instrumented site.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.started = time.perf_counter()
+        self._phases = {}
+        self._counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()  # Phases are added from both the worker and the GUI thread
+
+    def _ring(self, table, name):
+        ring = table.get(name)
+        if ring is None:
+            with self._lock:
+                ring = table.setdefault(name, _Ring(self.window))
+        return ring
+
+    def add(self, phase, seconds):
+        self._ring(self._phases, phase).push(seconds, time.perf_counter())
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        self._ring(self._counters, name).push(n, time.perf_counter())
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def rate(self, name):
+        # Events per second over the rolling window
+        ring = self._counters.get(name)
+        if ring is None or ring.count == 0:
+            return 0.0
+        values, stamps = ring.recent()
+        start = self.started if ring.count <= len(ring.values) else stamps.min()
+        elapsed = time.perf_counter() - start
+        return float(values.sum() / elapsed) if elapsed > 0 else 0.0
+
+    def summary(self):
+        phases = {}
+        for name, ring in list(self._phases.items()):
+            values, _ = ring.recent()
+            if not len(values):
+                continue
+            p50, p90, p99 = np.percentile(values, (50, 90, 99))
+            phases[name] = {'samples': len(values), 'total_samples': ring.count, 'mean': float(values.mean()),
+                            'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'max': float(values.max()),
+                            'histogram': np.histogram(values, BIN_EDGES)[0].tolist()}
+        rates = {name: self.rate(name) for name in list(self._counters)}
+        return {'window': self.window, 'bin_edges': BIN_EDGES.tolist(), 'phases': phases, 'rates': rates,
+                'gauges': dict(self.gauges)}
+
+    def status_text(self):
+        # One line for a status bar: rates, mean phase times and gauges
+        summary = self.summary()
+        parts = [f"{name}/s {rate:.1f}" for name, rate in summary['rates'].items()]
+        parts += [f"{name} {stats['mean'] * 1e3:.2f} ms" for name, stats in summary['phases'].items()]
+        parts += [f"{name} {value}" for name, value in summary['gauges'].items()]
+        return ' | '.join(parts)
+
+    def export(self, path):
+        """Write summary() to path, as CSV if it ends in .csv and JSON otherwise."""
+        summary = self.summary()
+        if not path.lower().endswith('.csv'):
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2)
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['kind', 'name', 'samples', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'value'])
+            for name, stats in summary['phases'].items():
+                writer.writerow(['phase', name, stats['samples']] +
+                                [f"{stats[key] * 1e3:.6f}" for key in ('mean', 'p50', 'p90', 'p99', 'max')] + [''])
+            for name, rate in summary['rates'].items():
+                writer.writerow(['rate', name] + [''] * 6 + [f"{rate:.6f}"])
+            for name, value in summary['gauges'].items():
+                writer.writerow(['gauge', name] + [''] * 6 + [value])
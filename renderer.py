@@ -0,0 +1,123 @@
+import numpy as np
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+from utilities import AU
+
+class SolarSystemRenderer:
+    """Draws SolarSystem snapshots into a 3D Matplotlib axes using persistent artists.
+
+    All trails share one line collection (one polyline per body) and all bodies share one scatter
+    collection, except test particles, which are drawn as a second scatter of small unshaded
+    points so that hundreds of thousands stay cheap to draw. Each frame only updates their data;
+    artists are created in rebuild(), which is needed only when bodies are added or removed.
+    Where the canvas supports it, frames are blitted over a cached background and the full figure
+    is redrawn only when the axis limits have to grow.
+    """
+
+    def __init__(self, canvas, ax, margin=1.2):
+        self.canvas = canvas
+        self.ax = ax
+        self.margin = margin  # Headroom added around the bodies when the limits are recomputed
+        self.data_bounds = None
+        self.count = 0
+        self.trails = None
+        self.scatter = None
+        self.particle_scatter = None
+        self.bodies = None  # Indices drawn by scatter, or None for all of them
+        self.particles = None  # Indices drawn by particle_scatter
+        self.limits = None
+        self.background = None
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def rebuild(self, snapshot):
+        if self.scatter is not None:
+            self.trails.remove()
+            self.scatter.remove()
+        if self.particle_scatter is not None:
+            self.particle_scatter.remove()
+            self.particle_scatter = None
+        self.count = len(snapshot.positions)
+        colors = [color or 'gray' for color in snapshot.colors]
+        self.colors = colors
+        self.trails = Line3DCollection([], linestyles='-', animated=True)
+        self.ax.add_collection3d(self.trails, autolim=False)
+        positions, sizes = snapshot.positions, snapshot.radii / AU * 100000
+        self.bodies = self.particles = None
+        if snapshot.particles is not None:
+            self.bodies = np.flatnonzero(~snapshot.particles)
+            self.particles = np.flatnonzero(snapshot.particles)
+            positions, sizes = positions[self.bodies], sizes[self.bodies]
+            colors = [colors[i] for i in self.bodies]
+            particle_colors = [self.colors[i] for i in self.particles]
+            if len(set(particle_colors)) == 1:
+                particle_colors = particle_colors[0]  # One colour for the whole collection is much faster to draw
+            points = snapshot.positions[self.particles]
+            self.particle_scatter = self.ax.scatter(points[:, 0], points[:, 1], points[:, 2], s=1, marker='.',
+                                                    c=particle_colors, linewidths=0, depthshade=False, animated=True)
+        self.scatter = self.ax.scatter(positions[:, 0], positions[:, 1], positions[:, 2],
+                                       s=sizes, marker='o', c=colors, animated=True)
+        self.limits = None
+        self.update(snapshot)
+
+    def update(self, snapshot):
+        if len(snapshot.positions) != self.count or (snapshot.particles is None) != (self.particles is None):
+            self.rebuild(snapshot)
+            return
+        positions = snapshot.positions
+        lo = positions.min(axis=0, initial=np.inf)
+        hi = positions.max(axis=0, initial=-np.inf)
+        segments, colors = [], []
+        for index, history in enumerate(snapshot.trails):
+            if history is not None and len(history) > 1:
+                segments.append(history)
+                colors.append(self.colors[index])
+                lo = np.minimum(lo, history.min(axis=0))
+                hi = np.maximum(hi, history.max(axis=0))
+        self.trails.set_segments(segments)
+        self.trails.set_color(colors)
+        if self.particles is not None:
+            points = positions[self.particles]
+            self.particle_scatter._offsets3d = (points[:, 0], points[:, 1], points[:, 2])
+            positions = positions[self.bodies]
+        self.scatter._offsets3d = (positions[:, 0], positions[:, 1], positions[:, 2])
+
+        if self._fit_limits(lo, hi) or self.background is None or not self.canvas.supports_blit:
+            self.canvas.draw()
+        else:
+            self._blit()
+
+    def _fit_limits(self, lo, hi):
+        # Grow the (cubic) axis limits to contain [lo, hi]; returns True when they changed
+        if not np.all(np.isfinite(lo)):
+            return False
+        if self.limits is not None:
+            if np.all(lo >= self.limits[0]) and np.all(hi <= self.limits[1]):
+                return False
+            lo = np.minimum(lo, self.data_bounds[0])
+            hi = np.maximum(hi, self.data_bounds[1])
+        self.data_bounds = (lo, hi)
+        center = (lo + hi) / 2
+        half = max((hi - lo).max() / 2 * self.margin, 1e6)
+        self.limits = (center - half, center + half)
+        self.ax.set_xlim3d(self.limits[0][0], self.limits[1][0])
+        self.ax.set_ylim3d(self.limits[0][1], self.limits[1][1])
+        self.ax.set_zlim3d(self.limits[0][2], self.limits[1][2])
+        return True
+
+    def _on_draw(self, event):
+        # A full redraw (resize, rotation, new limits) leaves a fresh background to blit over
+        if self.scatter is None:
+            return
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox) if self.canvas.supports_blit else None
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in (self.trails, self.particle_scatter, self.scatter):
+            if artist is None:
+                continue
+            artist.do_3d_projection()
+            self.ax.draw_artist(artist)
+
+    def _blit(self):
+        self.canvas.restore_region(self.background)
+        self._draw_artists()
+        self.canvas.blit(self.ax.bbox)
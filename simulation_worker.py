@@ -0,0 +1,130 @@
+import math
+import threading
+import time
+from PyQt5.QtCore import QThread, pyqtSignal
+
+class SimulationWorker(QThread):
+    """Steps a SolarSystem on a background thread, independently of the display rate.
+
+    Steps are taken in batches through SolarSystem.advance, sized so that one batch takes about
+    `publish_interval` and never overshoots `sim_rate`. After each batch a snapshot is published
+    to `latest` at most every `publish_interval` seconds; the GUI draws whichever snapshot is
+    newest when it gets round to it, so slow frames are skipped rather than queued. If `recorder`
+    is set, every step is also passed to it, and if `checkpoints` (a CheckpointWriter) is set, it
+    is polled after every batch. Anything else touching the system (or the recorder) must hold
+    `lock`. start(), pause() and stop() can be called any number of times.
+    """
+
+    collisionDetected = pyqtSignal(object)  # (K,2) array of colliding body indices
+    stepFailed = pyqtSignal(str)  # The integrator could not take a step; the worker pauses
+
+    def __init__(self, solar_system, lock=None, sim_rate=None, publish_interval=1 / 60, parent=None):
+        super().__init__(parent)
+        self.solar_system = solar_system
+        self.lock = lock or threading.RLock()
+        self.sim_rate = sim_rate  # Simulated seconds per wall-clock second; None runs flat out
+        self.publish_interval = publish_interval
+        self.latest = None
+        self.recorder = None
+        self.checkpoints = None
+        self.steps = 0
+        self.max_batch = 1000
+        self._step_seconds = None  # Running estimate of the wall-clock cost of one step
+        self._paused = False
+        self._stopping = False
+        self._wake = threading.Event()
+        self._reset_pace()
+
+    def start(self):
+        if self.isRunning():
+            self.resume()
+            return
+        self._stopping = False
+        self._paused = False
+        self._reset_pace()
+        super().start()
+
+    def pause(self):
+        self._paused = True
+
+    def resume(self):
+        if self._paused:
+            self._paused = False
+            self._reset_pace()
+            self._wake.set()
+
+    def is_paused(self):
+        return self._paused or not self.isRunning()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        self.wait()
+
+    def set_solar_system(self, solar_system):
+        with self.lock:
+            self.solar_system = solar_system
+            self.latest = None
+            self._step_seconds = None
+            self._reset_pace()
+
+    def set_sim_rate(self, sim_rate):
+        self.sim_rate = sim_rate
+        self._reset_pace()
+
+    def _reset_pace(self):
+        # Pacing is measured from here, so pauses and rate changes do not cause a burst of catch-up steps
+        self._pace_wall = time.perf_counter()
+        self._pace_sim = self.solar_system.time
+
+    def _batch_size(self, solar_system):
+        # Enough steps to fill about one publish interval, but no more than the pace allows
+        if self._step_seconds is None:
+            return 1
+        batch = min(self.max_batch, max(1, int(self.publish_interval / self._step_seconds)))
+        if self.sim_rate:
+            due = (time.perf_counter() - self._pace_wall) * self.sim_rate - (solar_system.time - self._pace_sim)
+            batch = min(batch, max(1, math.ceil(due / solar_system.dt)))
+        return batch
+
+    def run(self):
+        last_publish = 0.0
+        while not self._stopping:
+            if self._paused:
+                self._wake.wait(0.1)
+                self._wake.clear()
+                continue
+            with self.lock:
+                solar_system = self.solar_system
+                batch = self._batch_size(solar_system)
+                started = time.perf_counter()
+                try:
+                    result = solar_system.advance(batch, sample_every=1 if self.recorder is not None else batch,
+                                                  stop_on_collision=True)
+                except FloatingPointError as e:
+                    self._paused = True
+                    self.latest = solar_system.snapshot()
+                    self.stepFailed.emit(str(e))
+                    continue
+                now = time.perf_counter()
+                seconds = (now - started) / result.steps
+                self._step_seconds = seconds if self._step_seconds is None else 0.8 * self._step_seconds + 0.2 * seconds
+                if self.recorder is not None:
+                    self.recorder.record_frames(solar_system, result.times, result.positions, result.velocities)
+                if self.checkpoints is not None:
+                    self.checkpoints.poll(solar_system)
+                collisions = result.collisions
+                if len(collisions) or now - last_publish >= self.publish_interval:
+                    self.latest = solar_system.snapshot()
+                    last_publish = now
+                    if solar_system.profiler is not None:
+                        solar_system.profiler.add('snapshot', time.perf_counter() - now)
+            self.steps += result.steps
+            if len(collisions):
+                self._paused = True
+                self.collisionDetected.emit(collisions)
+            elif self.sim_rate:
+                ahead = (solar_system.time - self._pace_sim) / self.sim_rate - (time.perf_counter() - self._pace_wall)
+                if ahead > 0:
+                    self._wake.wait(ahead)
+                    self._wake.clear()
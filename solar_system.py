@@ -1,30 +1,286 @@
 from solar_system_body import SolarSystemBody
+from gravity import DirectSumWorkspace, ParallelDirectSum, gravitational_accelerations, potential_energy
+from collisions import find_collisions, find_contacts
+from trails import TrailBuffer
+from integrators import RK4Integrator, make_integrator
+from collections import namedtuple
+from time import perf_counter
+import os
 import numpy as np
 
+# Copy of what a viewer needs to draw the system; trails holds None for bodies with trails hidden
+# particles is a boolean mask of the test particles, or None when there are none
+SolarSystemSnapshot = namedtuple('SolarSystemSnapshot', ['time', 'positions', 'radii', 'colors', 'trails', 'particles'],
+                                 defaults=(None,))
+
+# Result of SolarSystem.advance: the sampled frames, how many steps were taken and why it stopped
+# ('steps', 'collision' or 'energy'), plus the overlapping pairs when it stopped on a collision
+AdvanceResult = namedtuple('AdvanceResult', ['times', 'positions', 'velocities', 'steps', 'stop_reason', 'collisions'])
+
+# Body count from which the 'auto' force backend switches from direct summation to Barnes-Hut. Tuned for
+# systems dominated by a central mass (belts, rings, disks), where the tree is twice as fast at this size;
+# for self-gravitating clusters it only wins from about 20,000 bodies at theta 0.5 and is far less accurate
+BARNES_HUT_MIN_BODIES = 8192
+
 class SolarSystem:
-    def __init__(self):
+    def __init__(self, capacity=16):
+        # All body state lives in contiguous arrays; SolarSystemBody objects are views into them
         self.bodies = []
+        self.colors = []
+        self._positions = np.zeros((capacity, 3))
+        self._velocities = np.zeros((capacity, 3))
+        self._masses = np.zeros(capacity)
+        self._radii = np.zeros(capacity)
+        self._particles = np.zeros(capacity, dtype=bool)  # Test particles feel gravity but exert none
+        self._workspace = DirectSumWorkspace()
+        self.integrator = RK4Integrator()
+        self.dt = 3600 * 24 * 7  # Default step in seconds (one week)
+        self.force_backend = 'auto'  # 'direct', 'barnes_hut', or 'auto' (by body count; tuned for disks)
+        self.theta = 0.5  # Barnes-Hut opening angle; smaller is more accurate and slower
+        self.force_workers = 1  # Threads for direct summation; None uses every core
+        self._parallel = None
+        self.time = 0.0  # Simulated seconds since the start of the run
+        self.trails = TrailBuffer()
+        self.profiler = None  # A profiling.PhaseProfiler to time stepping phases, or None
+
+    @property
+    def positions(self):
+        return self._positions[:len(self.bodies)]
+
+    @property
+    def velocities(self):
+        return self._velocities[:len(self.bodies)]
+
+    @property
+    def masses(self):
+        return self._masses[:len(self.bodies)]
+
+    @property
+    def radii(self):
+        return self._radii[:len(self.bodies)]
+
+    @property
+    def particles(self):
+        return self._particles[:len(self.bodies)]
+
+    def _reserve(self, count):
+        # Grow the backing arrays geometrically so repeated add_body calls stay amortised O(1)
+        capacity = len(self._masses)
+        if count <= capacity:
+            return
+        while capacity < count:
+            capacity *= 2
+        n = len(self.bodies)
+        for name in ('_positions', '_velocities', '_masses', '_radii', '_particles'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:n] = old[:n]
+            setattr(self, name, new)
 
     def add_body(self, body):
+        index = len(self.bodies)
+        self._reserve(index + 1)
+        state = body._state
+        self._positions[index] = state['position']
+        self._velocities[index] = state['velocity']
+        self._masses[index] = state['mass']
+        self._radii[index] = state['radius']
+        self._particles[index] = state['particle']
+        self.colors.append(state['color'])
+        body.solar_system = self
+        body.index = index
+        body._state = None
         self.bodies.append(body)
 
+    def add_bodies(self, positions, velocities, masses, radii, colors=None, particles=False):
+        """Add many bodies in one operation and return the new SolarSystemBody views.
+
+        positions and velocities are (N,3); masses, radii, colors and particles may be length-N
+        sequences or single values shared by every new body. Test particles (particles=True) move
+        under the other bodies' gravity without exerting any, and start with their trails hidden.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        n = len(positions)
+        if isinstance(colors, str) or colors is None:
+            colors = [colors] * n
+        elif len(colors) != n:
+            raise ValueError(f"Expected {n} colors, got {len(colors)}")
+        masses = np.broadcast_to(np.asarray(masses, dtype=np.float64), (n,))
+        start = len(self.bodies)
+        self._reserve(start + n)
+        self._positions[start:start + n] = positions
+        self._velocities[start:start + n] = velocities
+        self._masses[start:start + n] = masses
+        self._radii[start:start + n] = radii
+        self._particles[start:start + n] = particles
+        self.colors.extend(colors)
+        visual_radii = ((masses / 5.97e24)**(1 / 3) * 1e7).tolist()
+        show_trail = (~self._particles[start:start + n]).tolist()
+        view = SolarSystemBody._view
+        self.bodies.extend([view(self, start + i, visual_radii[i], show_trail[i]) for i in range(n)])
+        return self.bodies[start:]
+
+    def sources(self):
+        # Indices of the bodies that exert gravity, or None when every body does
+        particles = self.particles
+        return np.flatnonzero(~particles) if particles.any() else None
+
+    def accelerations(self, positions=None, out=None, workspace=None, targets=None):
+        # Gravitational acceleration on every body (or only the bodies indexed by targets),
+        # at the given (N,3) positions or the current ones. Only massive bodies are sources, so
+        # test particles cost one interaction per massive body rather than one per body.
+        if positions is None:
+            positions = self.positions
+        if workspace is None:
+            workspace = self._workspace
+        sources = self.sources()
+        if sources is None:
+            source_positions, masses = positions, self.masses
+        else:
+            source_positions, masses = positions[sources], self.masses[sources]
+        gm = workspace.scaled_masses(masses)
+        target_positions = positions if targets is None else positions[targets]
+        if self.uses_tree(len(masses)):
+            # Imported on first use; most systems never reach BARNES_HUT_MIN_BODIES
+            from barnes_hut import barnes_hut_accelerations
+            return barnes_hut_accelerations(target_positions, source_positions, gm, self.theta, out=out)
+        if self.force_workers != 1:
+            return self._parallel_sum().accelerations(target_positions, source_positions, gm, out=out,
+                                                      dtype=workspace.dtype)
+        return gravitational_accelerations(target_positions, source_positions, gm, out=out, workspace=workspace)
+
+    def _parallel_sum(self):
+        # The thread pool is kept between steps and replaced when force_workers changes
+        parallel = self._parallel
+        if parallel is None or parallel.workers != (self.force_workers or os.cpu_count()):
+            if parallel is not None:
+                parallel.close()
+            parallel = self._parallel = ParallelDirectSum(self.force_workers)
+        return parallel
+
+    def uses_tree(self, sources=None):
+        # sources is the number of massive bodies, counted here when not given
+        if self.force_backend == 'auto':
+            if sources is None:
+                sources = len(self.bodies) - int(np.count_nonzero(self.particles))
+            return sources >= BARNES_HUT_MIN_BODIES
+        if self.force_backend not in ('direct', 'barnes_hut'):
+            raise ValueError(f"Unknown force backend: {self.force_backend}")
+        return self.force_backend == 'barnes_hut'
+
+    def set_integrator(self, integrator, **options):
+        # Accepts an integrator instance or a name from integrators.INTEGRATORS
+        if isinstance(integrator, str):
+            integrator = make_integrator(integrator, **options)
+        self.integrator = integrator
+
     def update_all(self, dt):
-        for body in self.bodies:
-            body.move(dt)
+        profiler = self.profiler
+        if profiler is None:
+            self.integrator.step(self, dt)
+            self.time += dt
+            self.trails.record(self.positions)
+            return
+        start = perf_counter()
+        self.integrator.step(self, dt)
+        physics = perf_counter()
+        self.time += dt
+        self.trails.record(self.positions)
+        profiler.add('physics', physics - start)
+        profiler.add('trails', perf_counter() - physics)
+        profiler.count('steps')
+
+    def advance(self, n_steps, dt=None, sample_every=1, stop_on_collision=False, max_energy_drift=None,
+                reference_energy=None):
+        """Take up to n_steps steps of dt (default self.dt) in one call, keeping every sample_every-th state.
+
+        Frames go into arrays allocated once up front. The run stops early after a step that leaves
+        bodies overlapping (with stop_on_collision), or once the total energy has drifted by more
+        than max_energy_drift relative to reference_energy, by default its value at the start (checked
+        at every sample). On an early stop the final state is always included as the last frame.
+        """
+        if dt is None:
+            dt = self.dt
+        n = len(self.bodies)
+        frames = n_steps // sample_every + 1
+        times = np.empty(frames)
+        positions = np.empty((frames, n, 3))
+        velocities = np.empty((frames, n, 3))
+        if max_energy_drift is not None and reference_energy is None:
+            reference_energy = self.total_energy()
+        step, record, profiler = self.integrator.step, self.trails.record, self.profiler
+        x, v = self.positions, self.velocities
+        frame = 0
+        stop_reason = 'steps'
+        collisions = np.empty((0, 2), dtype=np.int64)
+        taken = 0
+        while taken < n_steps:
+            if profiler is None:
+                step(self, dt)
+                self.time += dt
+                record(x)
+            else:
+                self.update_all(dt)
+            taken += 1
+            if stop_on_collision:
+                collisions = self.check_collisions()
+                if len(collisions):
+                    stop_reason = 'collision'
+            sampled = taken % sample_every == 0
+            if sampled and max_energy_drift is not None and stop_reason == 'steps':
+                drift = abs((self.total_energy() - reference_energy) / reference_energy) if reference_energy else 0.0
+                if drift > max_energy_drift:
+                    stop_reason = 'energy'
+            if sampled or stop_reason != 'steps':
+                times[frame] = self.time
+                positions[frame] = x
+                velocities[frame] = v
+                frame += 1
+            if stop_reason != 'steps':
+                break
+        return AdvanceResult(times[:frame], positions[:frame], velocities[:frame], taken, stop_reason, collisions)
 
-    def calculate_all_body_interactions(self, dt):
-        for body in self.bodies:
-            body.move(dt)
+    def total_energy(self):
+        # Kinetic plus gravitational potential energy of the massive bodies, in joules; test
+        # particles do not act back on them, so they are left out
+        positions, velocities, masses = self.positions, self.velocities, self.masses
+        sources = self.sources()
+        if sources is not None:
+            positions, velocities, masses = positions[sources], velocities[sources], masses[sources]
+        kinetic = 0.5 * np.dot(masses, np.einsum('ij,ij->i', velocities, velocities))
+        return kinetic + potential_energy(positions, masses, self._workspace)
 
+    def calculate_all_body_interactions(self, dt=None):
+        # Accelerations only; stepping is done by update_all or advance
+        return self.accelerations()
 
     def check_collisions(self):
-        for i, body in enumerate(self.bodies):
-            for j, other_body in enumerate(self.bodies):
-                if i != j:
-                    distance = np.linalg.norm(body.position - other_body.position)
-                    if distance < (body.radius + other_body.radius):
-                        print(f"Collision detected between body {i} and body {j}")
-                        print(f"Distance: {distance}, Combined Radii: {body.radius + other_body.radius}")
-                        print(f"Positions: {body.position}, {other_body.position}")
-                        return (i, j), body.position
-        return None, None
\ No newline at end of file
+        # All overlapping pairs (i < j) as a (K,2) index array; empty when nothing collides
+        if self.profiler is None:
+            return self._find_collisions()
+        with self.profiler.phase('collisions'):
+            return self._find_collisions()
+
+    def _find_collisions(self):
+        # Pairs of test particles are never checked: each particle is only swept against the massive bodies
+        positions, radii = self.positions, self.radii
+        sources = self.sources()
+        if sources is None:
+            return find_collisions(positions, radii)
+        particles = np.flatnonzero(self.particles)
+        pairs = sources[find_collisions(positions[sources], radii[sources])]
+        contacts = find_contacts(positions[sources], radii[sources], positions[particles], radii[particles])
+        contacts = np.sort(np.column_stack((sources[contacts[:, 0]], particles[contacts[:, 1]])), axis=1)
+        pairs = np.concatenate((pairs, contacts))
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+    def snapshot(self):
+        # Independent copy of the drawable state, safe to hand to another thread
+        # Bodies past trails.max_bodies have no trail, so they are not visited one by one
+        shown = [i for i, body in enumerate(self.bodies[:self.trails.bodies]) if body.show_trail]
+        trails = [None] * len(self.bodies)
+        for i, trail in zip(shown, self.trails.points_of(shown)):
+            trails[i] = trail
+        particles = self.particles.copy() if self.particles.any() else None
+        return SolarSystemSnapshot(self.time, self.positions.copy(), self.radii.copy(), list(self.colors), trails,
+                                   particles)
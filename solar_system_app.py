@@ -1,13 +1,17 @@
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 import numpy as np
+import re
+import threading
 from solar_system import SolarSystem
 from solar_system_body import SolarSystemBody
 import math
 from utilities import AU, G
-import regex as re
+from integrators import INTEGRATORS
+from simulation_worker import SimulationWorker
+from trajectory import TrajectoryRecorder, TrajectoryReader
+from checkpoint import CheckpointWriter, load_checkpoint, save_checkpoint
+from profiling import PhaseProfiler
 
 #contant:
 sun_mass=1.989e+30
@@ -16,9 +20,23 @@ class SolarSystemApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.solarSystem = SolarSystem()  # Instantiate SolarSystem object 
+        self.integratorName = 'rk4'
+        self.simLock = threading.RLock()  # Held by the worker while stepping; hold it to change the system
+        self.worker = None
+        self.displayTimer = None
+        self.lastSnapshot = None
+        self.recorder = None
+        self.checkpoints = None  # CheckpointWriter while autosave is on
+        self.autosaveWarned = False  # Whether the current autosave's failure has been reported
+        self.replay = None  # TrajectoryReader while scrubbing through a recording
+        self.stream = None  # FrameClient while showing another process's simulation
+        self.streamMeta = None
+        self.profiler = None  # PhaseProfiler while the performance HUD is on
+        self.hudTimer = None
+        self.simRate = 20 * 3600 * 24 * 7  # Simulated seconds per second (20 weeks, the old 50 ms timer pace)
         self.initUI()
         self.quiz_progress = 0
-        self.initializeQuizQuestions()
+        self.quiz_questions = None  # Loaded by initializeQuizQuestions when the first quiz starts
 
     def initUI(self):
         self.setWindowTitle('Solar System Simulation')
@@ -29,8 +47,13 @@ class SolarSystemApp(QMainWindow):
         # Main layout for the central widget
         mainLayout = QVBoxLayout(self.central_widget)
 
+        # Matplotlib is imported here rather than at module level, so importing this module stays cheap
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+        from renderer import SolarSystemRenderer
         self.canvas = FigureCanvas(Figure())
         self.ax = self.canvas.figure.add_subplot(111, projection='3d')
+        self.renderer = SolarSystemRenderer(self.canvas, self.ax)
         mainLayout.addWidget(self.canvas)
 
         # Create menu bar items
@@ -40,12 +63,29 @@ class SolarSystemApp(QMainWindow):
 
         # Add actions to the control menu
         controlMenu.addAction('Start Simulation', self.startSimulation)
+        controlMenu.addAction('Pause Simulation', self.pauseSimulation)
+        controlMenu.addAction('Stop Simulation', self.stopSimulation)
+        controlMenu.addAction('Set Simulation Speed', self.showSpeedDialog)
         controlMenu.addAction('Toggle Orbit Trails', self.toggleOrbitTrails)
         controlMenu.addAction('Reset Orbit Trails', self.clearOrbitTrails)
         controlMenu.addAction('List Bodies Info', self.listBodiesInfo)
         controlMenu.addAction('Add New Body', self.showNewBodyDialog)
         controlMenu.addAction('Adjust Body Mass', self.showMassAdjustmentDialog)
+        controlMenu.addAction('Generate Bodies', self.showGenerateBodiesDialog)
+        controlMenu.addAction('Import Bodies', self.importBodies)
         controlMenu.addAction('Reset Simulation', self.resetSimulation)
+        controlMenu.addAction('Select Integrator', self.showIntegratorDialog)
+        controlMenu.addAction('Start Recording', self.startRecording)
+        controlMenu.addAction('Stop Recording', self.stopRecording)
+        controlMenu.addAction('Open Replay', self.openReplay)
+        controlMenu.addAction('Close Replay', self.closeReplay)
+        controlMenu.addAction('Connect to Stream', self.connectStream)
+        controlMenu.addAction('Disconnect Stream', self.disconnectStream)
+        controlMenu.addAction('Save Checkpoint', self.saveCheckpoint)
+        controlMenu.addAction('Load Checkpoint', self.loadCheckpoint)
+        controlMenu.addAction('Autosave Checkpoints', self.showAutosaveDialog)
+        controlMenu.addAction('Toggle Performance HUD', self.toggleProfiler)
+        controlMenu.addAction('Export Performance Profile', self.exportProfile)
 
         # Add action to the quiz menu
         quizMenu.addAction('Start Quiz', self.showQuiz)
@@ -93,9 +133,27 @@ class SolarSystemApp(QMainWindow):
         new_mass = float(newMassEdit.text()) * 5.97e24  # Convert from Earth masses to kg
 
         # Update the body's mass
-        body.mass = new_mass
+        with self.simLock:
+            body.mass = new_mass
         self.updatePlot()
     
+    def showIntegratorDialog(self):
+        names = sorted(INTEGRATORS)
+        name, ok = QInputDialog.getItem(self, "Select Integrator", "Integrator:", names,
+                                        names.index(self.integratorName), False)
+        if ok:
+            self.integratorName = name
+            with self.simLock:
+                self.solarSystem.set_integrator(name)
+
+    def showSpeedDialog(self):
+        weeks, ok = QInputDialog.getDouble(self, "Simulation Speed", "Simulated weeks per second (0 = as fast as possible):",
+                                           (self.simRate or 0) / (3600 * 24 * 7), 0, 1e6, 1)
+        if ok:
+            self.simRate = weeks * 3600 * 24 * 7 or None
+            if self.worker is not None:
+                self.worker.set_sim_rate(self.simRate)
+
     def resetSimulation(self):
         # Reset the simulation
         self.initSolarSystem()  # Reinitialize the solar system
@@ -103,8 +161,8 @@ class SolarSystemApp(QMainWindow):
 
     def clearOrbitTrails(self):
         # Implementation to clear the orbit trails
-        for body in self.solarSystem.bodies:
-            body.history.clear()
+        with self.simLock:
+            self.solarSystem.trails.clear()
         self.updatePlot()
     
     def showNewBodyDialog(self):
@@ -181,74 +239,14 @@ class SolarSystemApp(QMainWindow):
             self.addNewBody(mass, massUnit, f"{distance_components[0]},{distance_components[1]},0", f"0,0,{suggested_velocity}")
 
     def initializeQuizQuestions(self):
-        self.quiz_questions = [
-            # Include all the quiz questions here with explanations
-            {"question": "What is the force that keeps planets in orbit around the sun?", 
-             "options": ["Gravity", "Magnetism", "Electrostatic force"], 
-             "answer": "Gravity",
-             "explanation": "Gravity is the force that keeps planets in orbit. It's the attractive force between two masses."},
-
-            {"question": "If a satellite orbits closer to the Earth, how does its orbital speed compare to a satellite farther away?",
-             "options": ["Faster", "Slower", "The same", "Cannot be determined"],
-             "answer": "Faster",
-             "explanation": "According to Kepler's third law, orbital speed increases as the orbital radius decreases."},
-            
-            {"question": "How does the gravitational force between two objects change if the distance between them doubles?",
-             "options": ["Increases four times", "Decreases four times", "Increases two times", "Decreases two times"],
-             "answer": "Decreases four times",
-             "explanation": "Gravitational force is inversely proportional to the square of the distance. Doubling the distance decreases the force by a factor of four."},
-
-            {"question": "What is the minimum velocity needed for an object to maintain a stable orbit around the Sun at 1 AU?",
-            "options": ["29.78 km/s", "24.13 km/s", "42.1 km/s", "33.2 km/s"],
-            "answer": "29.78 km/s",
-            "explanation": "The minimum velocity for a stable orbit at 1 AU (the distance of Earth from the Sun) is about 29.78 km/s. This is calculated using the formula v = √(GM/r), where G is the gravitational constant, M is the mass of the Sun, and r is the radius of the orbit."},
-
-             # New questions
-            {"question": "What would happen to Earth's orbit if the Sun's mass suddenly doubled?",
-             "options": ["The orbit would remain the same", "The orbit would become more elliptical", "The Earth would move closer to the Sun", "The Earth would move farther from the Sun"],
-             "answer": "The Earth would move closer to the Sun",
-             "explanation": "Doubling the Sun's mass would increase the gravitational force, pulling Earth closer and possibly leading to a more elliptical orbit."},
-
-            {"question": "What is the escape velocity from Earth's surface?",
-             "options": ["7.9 km/s", "11.2 km/s", "9.8 m/s^2", "5.5 km/s"],
-             "answer": "11.2 km/s",
-             "explanation": "Escape velocity is the speed needed to break free from a planet's gravitational pull. For Earth, it's approximately 11.2 km/s."},
-
-            {"question": "How does the orbital period of a planet change with respect to its semi-major axis length?",
-             "options": ["Increases linearly", "Decreases linearly", "Increases with the square of the semi-major axis length", "Increases with the cube root of the semi-major axis length"],
-             "answer": "Increases with the cube root of the semi-major axis length",
-             "explanation": "According to Kepler's third law, the square of a planet's orbital period is proportional to the cube of the semi-major axis of its orbit."},
-
-            {"question": "If a new planet was discovered at 2 AU from the Sun, how would its year compare to Earth's?",
-             "options": ["About the same as Earth's", "Twice as long as Earth's", "Half as long as Earth's", "Approximately 2.8 times longer than Earth's"],
-             "answer": "Approximately 2.8 times longer than Earth's",
-             "explanation": "Using Kepler's third law, a planet at 2 AU would have an orbital period √2³ = 2.8 times longer than Earth's year."},
-
-            {"question": "What is the significance of the Lagrange points in a two-body system?",
-             "options": ["Points where gravitational forces are balanced", "Points where escape velocity is zero", "Points where orbital speed is highest", "Points where gravitational forces are strongest"],
-             "answer": "Points where gravitational forces are balanced",
-             "explanation": "Lagrange points are positions where the gravitational pull of two large bodies precisely equals the centripetal force required to orbit with them."},
-
-            {"question": "Calculate the orbital speed of a satellite at a height of 300 km above Earth's surface. (Earth's radius = 6371 km, Earth's mass = 5.97e24 kg)",
-             "options": ["7.8 km/s", "8.1 km/s", "7.4 km/s", "8.5 km/s"],
-             "answer": "7.8 km/s",
-             "explanation": "Orbital speed v = √(GM/(R+h)), where R is Earth's radius, h is satellite's height. Plugging in the values gives v ≈ 7.8 km/s."},
-
-            {"question": "A planet orbits a star twice the mass of the Sun at the same distance as Earth from the Sun. What is its orbital period compared to Earth's?",
-             "options": ["Same as Earth's", "Twice Earth's", "Half of Earth's", "Four times Earth's"],
-             "answer": "Same as Earth's",
-             "explanation": "Orbital period depends on the semi-major axis, not the star's mass. So, it remains the same as Earth's."},
-
-            {"question": "What would be the gravitational force between two 1 kg masses 1 meter apart?",
-             "options": ["6.67e-11 N", "6.67e-10 N", "1 N", "0 N"],
-             "answer": "6.67e-11 N",
-             "explanation": "Using Newton's law of universal gravitation, F = Gm1m2/r², where G is 6.67e-11 Nm²/kg²."},
-
-        ]
+        from quiz_questions import QUIZ_QUESTIONS
+        self.quiz_questions = QUIZ_QUESTIONS
     
         self.quiz_progress = 0
 
     def showQuiz(self):
+        if self.quiz_questions is None:
+            self.initializeQuizQuestions()
         if self.quiz_progress >= len(self.quiz_questions):
             QMessageBox.information(self, "Quiz", "You have completed all the questions!")
             choice = QMessageBox.question(self, "Restart Quiz?", "Do you want to restart the quiz?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
@@ -333,8 +331,84 @@ class SolarSystemApp(QMainWindow):
         # Create a new SolarSystemBody and add it to the simulation
         new_body = SolarSystemBody(self.solarSystem, mass, 1e6, position, velocity)  # Set a default radius
         new_body.color = 'green'  # Default color
-        self.solarSystem.add_body(new_body)
-        self.updatePlot()
+        with self.simLock:
+            self.solarSystem.add_body(new_body)
+            snapshot = self.solarSystem.snapshot()
+        self.renderer.rebuild(snapshot)
+
+    def showGenerateBodiesDialog(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Generate Bodies")
+
+        layout = QFormLayout(dialog)
+
+        kindCombo = QComboBox(dialog)
+        kindCombo.addItems(["Asteroid Belt", "Ring", "Debris Cloud"])
+        centralCombo = QComboBox(dialog)
+        for i in range(min(len(self.solarSystem.bodies), 100)):
+            centralCombo.addItem(f"Body {i}", i)
+        countEdit = QLineEdit("10000", dialog)
+        innerEdit = QLineEdit(dialog)
+        outerEdit = QLineEdit(dialog)
+        innerEdit.setPlaceholderText("default")
+        outerEdit.setPlaceholderText("default")
+        particlesCheck = QCheckBox("Test particles (feel gravity but exert none)", dialog)
+        particlesCheck.setChecked(True)
+
+        layout.addRow("Population:", kindCombo)
+        layout.addRow("Around:", centralCombo)
+        layout.addRow("Number of bodies:", countEdit)
+        layout.addRow("Inner distance (AU):", innerEdit)
+        layout.addRow("Outer distance (AU):", outerEdit)
+        layout.addRow(particlesCheck)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, dialog)
+        buttons.accepted.connect(lambda: self.generateBodies(
+            dialog, kindCombo.currentText(), centralCombo.currentData(), countEdit.text(), innerEdit.text(), outerEdit.text(),
+            particlesCheck.isChecked()))
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+
+        dialog.setLayout(layout)
+        dialog.exec_()
+
+    def generateBodies(self, dialog, kind, central, count, inner, outer, particles=True):
+        from populations import asteroid_belt, ring, debris_cloud
+        generators = {"Asteroid Belt": asteroid_belt, "Ring": ring, "Debris Cloud": debris_cloud}
+        try:
+            options = {'count': int(count), 'particles': particles}
+            if inner.strip():
+                options['inner'] = float(inner) * AU
+            if outer.strip():
+                options['outer'] = float(outer) * AU
+        except ValueError as e:
+            QMessageBox.warning(self, "Input Error", f"Please enter valid numbers. Error: {e}")
+            return
+        if central is None:
+            return
+        with self.simLock:
+            population = generators[kind](self.solarSystem, central, **options)
+        self.addBodies(population)
+        dialog.accept()
+
+    def importBodies(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Bodies", "", "Body Files (*.csv *.npy);;All Files (*)")
+        if not path:
+            return
+        from populations import load_bodies
+        try:
+            population = load_bodies(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Import Error", f"Could not read the bodies. Error: {e}")
+            return
+        self.addBodies(population)
+
+    def addBodies(self, population):
+        # One bulk insertion and one redraw, however many bodies there are
+        with self.simLock:
+            self.solarSystem.add_bodies(*population)
+            snapshot = self.solarSystem.snapshot()
+        self.renderer.rebuild(snapshot)
 
     def parse_vector(self, vector_str):
         # Strip 'AU' if present and extract numbers
@@ -354,47 +428,50 @@ class SolarSystemApp(QMainWindow):
     
     def listBodiesInfo(self):
         info = []
-        for i, body in enumerate(self.solarSystem.bodies):
-            body_name = f"Body {i}"
-            info.append(f"{body_name}: Position: {body.position}, Mass: {body.mass}")
+        with self.simLock:
+            for i, body in enumerate(self.solarSystem.bodies):
+                body_name = f"Body {i}"
+                info.append(f"{body_name}: Position: {body.position}, Mass: {body.mass}")
         info_str = "\n".join(info)
         QMessageBox.information(self, "Bodies Information", info_str)
 
     def initSolarSystem(self):
-        self.solarSystem = SolarSystem()
+        solarSystem = SolarSystem()
+        solarSystem.set_integrator(self.integratorName)
+        solarSystem.profiler = self.profiler
 
         # Sun
-        self.sun = SolarSystemBody(self.solarSystem, mass=1.989e+30, radius=696340000, position=(0, 0, 0), velocity=(0, 0, 0))
+        self.sun = SolarSystemBody(solarSystem, mass=1.989e+30, radius=696340000, position=(0, 0, 0), velocity=(0, 0, 0))
         self.sun.color = 'yellow'
-        self.solarSystem.add_body(self.sun)
+        solarSystem.add_body(self.sun)
 
         # Earth
         earth_velocity = (0, np.sqrt(G * self.sun.mass / AU), 0)
-        earth = SolarSystemBody(self.solarSystem, mass=5.97e+24, radius=6371000, position=(-AU, 0, 0), velocity=earth_velocity)
+        earth = SolarSystemBody(solarSystem, mass=5.97e+24, radius=6371000, position=(-AU, 0, 0), velocity=earth_velocity)
         earth.color = 'blue'
-        self.solarSystem.add_body(earth)
+        solarSystem.add_body(earth)
 
         # Mars
         mars_distance = 1.5 * AU
         mars_velocity = (0, np.sqrt(G * self.sun.mass / mars_distance), 0)
-        mars = SolarSystemBody(self.solarSystem, mass=6.39e+23, radius=3389500, position=(-mars_distance, 0, 0), velocity=mars_velocity)
+        mars = SolarSystemBody(solarSystem, mass=6.39e+23, radius=3389500, position=(-mars_distance, 0, 0), velocity=mars_velocity)
         mars.color = 'red'
-        self.solarSystem.add_body(mars)
+        solarSystem.add_body(mars)
 
         # Jupiter
         jupiter_distance = 5.2 * AU
         jupiter_velocity = (0, np.sqrt(G * self.sun.mass / jupiter_distance), 0)
-        jupiter = SolarSystemBody(self.solarSystem, mass=1.898e+27, radius=69911000, position=(-jupiter_distance, 0, 0), velocity=jupiter_velocity)
+        jupiter = SolarSystemBody(solarSystem, mass=1.898e+27, radius=69911000, position=(-jupiter_distance, 0, 0), velocity=jupiter_velocity)
         jupiter.color = 'orange'
-        self.solarSystem.add_body(jupiter)
+        solarSystem.add_body(jupiter)
 
         """ # Add a rogue planet or black hole
         rogue_mass = 1.989e+30 * 1000  # Mass 1000 times that of the Sun
         rogue_distance = 3 * AU  # Position it some distance away
         rogue_velocity = (0, -np.sqrt(G * self.sun.mass / rogue_distance) / 2, 0)  # Giving it an initial velocity
-        rogue_planet = SolarSystemBody(self.solarSystem, mass=rogue_mass, radius=696340000, position=(rogue_distance, 0, 0), velocity=rogue_velocity)
+        rogue_planet = SolarSystemBody(solarSystem, mass=rogue_mass, radius=696340000, position=(rogue_distance, 0, 0), velocity=rogue_velocity)
         rogue_planet.color = 'black'  # Color it black to represent a black hole
-        self.solarSystem.add_body(rogue_planet) """
+        solarSystem.add_body(rogue_planet) """
 
         """
         # Black hole parameters
@@ -403,38 +480,309 @@ class SolarSystemApp(QMainWindow):
         black_hole_velocity = (0, np.sqrt(G * self.sun.mass / black_hole_distance) / 3, 0)  # A slower initial velocity
 
         # Add the black hole
-        black_hole = SolarSystemBody(self.solarSystem, mass=black_hole_mass, radius=696340000, position=(black_hole_distance, 0, 0), velocity=black_hole_velocity)
+        black_hole = SolarSystemBody(solarSystem, mass=black_hole_mass, radius=696340000, position=(black_hole_distance, 0, 0), velocity=black_hole_velocity)
         black_hole.color = 'black'
-        self.solarSystem.add_body(black_hole) """
+        solarSystem.add_body(black_hole) """
+
+        # Built aside and swapped in under the lock, as the worker may be stepping the old system
+        with self.simLock:
+            self.solarSystem = solarSystem
+            if self.worker is not None:
+                self.worker.set_solar_system(solarSystem)
+            snapshot = solarSystem.snapshot()
+        self.renderer.rebuild(snapshot)
 
     def startSimulation(self):
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.updateSimulation)
-        self.timer.start(50)  # 50 milliseconds
-
-    def updateSimulation(self):
-        dt = 3600 * 24 * 7 # One day in seconds
-        self.solarSystem.calculate_all_body_interactions(dt)
-        self.solarSystem.update_all(dt)
+        # Physics runs on the worker thread; the display timer only draws its latest snapshot
+        if self.replay is not None:
+            self.closeReplay()
+        self.disconnectStream()
+        if self.worker is None:
+            self.worker = SimulationWorker(self.solarSystem, self.simLock, sim_rate=self.simRate, parent=self)
+            self.worker.collisionDetected.connect(self.onCollision)
+            self.worker.stepFailed.connect(self.onStepFailed)
+            self.worker.recorder = self.recorder
+            self.worker.checkpoints = self.checkpoints
+        self.worker.start()
+        if self.displayTimer is None:
+            self.displayTimer = QTimer(self)
+            self.displayTimer.timeout.connect(self.renderLatest)
+        if not self.displayTimer.isActive():
+            self.displayTimer.start(16)  # About 60 frames per second
+
+    def pauseSimulation(self):
+        if self.worker is not None:
+            self.worker.pause()
+
+    def stopSimulation(self):
+        if self.worker is not None:
+            self.worker.stop()
+        if self.displayTimer is not None:
+            self.displayTimer.stop()
+        self.renderLatest()
+
+    def closeEvent(self, event):
+        self.stopSimulation()
+        self.disconnectStream()
+        self.stopRecording()
+        self.setAutosave(None)
+        super().closeEvent(event)
+
+    def saveCheckpoint(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Checkpoint", "", "Checkpoints (*.sscp);;All Files (*)")
+        if not path:
+            return
+        with self.simLock:
+            try:
+                save_checkpoint(self.solarSystem, path)
+            except OSError as e:
+                QMessageBox.warning(self, "Checkpoint Error", f"Could not save the checkpoint. Error: {e}")
+
+    def loadCheckpoint(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load Checkpoint", "", "Checkpoints (*.sscp);;All Files (*)")
+        if not path:
+            return
+        try:
+            solarSystem = load_checkpoint(path)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Checkpoint Error", f"Could not load the checkpoint. Error: {e}")
+            return
+        self.closeReplay()
+        with self.simLock:
+            solarSystem.profiler = self.profiler
+            self.solarSystem = solarSystem
+            self.integratorName = solarSystem.integrator.name
+            if self.worker is not None:
+                self.worker.set_solar_system(solarSystem)
+            snapshot = solarSystem.snapshot()
+        self.renderer.rebuild(snapshot)
+
+    def showAutosaveDialog(self):
+        minutes, ok = QInputDialog.getDouble(self, "Autosave Checkpoints", "Minutes between checkpoints (0 = off):",
+                                             self.checkpoints.interval / 60 if self.checkpoints else 5, 0, 1e4, 1)
+        if not ok:
+            return
+        path = None
+        if minutes:
+            path, _ = QFileDialog.getSaveFileName(self, "Autosave To", "", "Checkpoints (*.sscp);;All Files (*)")
+            if not path:
+                return
+        self.setAutosave(path, minutes * 60)
+
+    def setAutosave(self, path, interval=300.0):
+        # Replace the background checkpoint writer; path None turns autosave off
+        with self.simLock:
+            old, self.checkpoints = self.checkpoints, CheckpointWriter(path, interval) if path else None
+            self.autosaveWarned = False
+            if self.worker is not None:
+                self.worker.checkpoints = self.checkpoints
+        if old is not None:
+            old.close()
+
+    def startRecording(self):
+        directory = QFileDialog.getExistingDirectory(self, "Record Trajectory To")
+        if not directory:
+            return
+        self.stopRecording()
+        with self.simLock:
+            self.recorder = TrajectoryRecorder(directory)
+            if self.worker is not None:
+                self.worker.recorder = self.recorder
+
+    def stopRecording(self):
+        if self.recorder is None:
+            return
+        with self.simLock:
+            if self.worker is not None:
+                self.worker.recorder = None
+            self.recorder.close()
+            self.recorder = None
+
+    def openReplay(self):
+        directory = QFileDialog.getExistingDirectory(self, "Open Recorded Trajectory")
+        if not directory:
+            return
+        try:
+            replay = TrajectoryReader(directory)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Replay Error", f"Could not open the recording. Error: {e}")
+            return
+        if not len(replay):
+            QMessageBox.warning(self, "Replay Error", "The recording has no frames.")
+            return
+        self.pauseSimulation()
+        self.disconnectStream()
+        self.closeReplay()
+        self.replay = replay
+        self.replayLabel = QLabel(self.central_widget)
+        self.replaySlider = QSlider(Qt.Horizontal, self.central_widget)
+        self.replaySlider.setRange(0, len(replay) - 1)
+        self.replaySlider.valueChanged.connect(self.showReplayFrame)
+        self.slidersLayout.addWidget(self.replayLabel)
+        self.slidersLayout.addWidget(self.replaySlider)
+        self.showReplayFrame(0)
+
+    def showReplayFrame(self, frame):
+        # Only this frame and its trail are read from disk
+        snapshot = self.replay.snapshot(frame)
+        self.replayLabel.setText(f"Frame {frame + 1} of {len(self.replay)}, "
+                                 f"t = {snapshot.time / (3600 * 24 * 365.25):.2f} years")
+        self.drawSnapshot(snapshot)
+
+    def closeReplay(self):
+        if self.replay is None:
+            return
+        for widget in (self.replayLabel, self.replaySlider):
+            self.slidersLayout.removeWidget(widget)
+            widget.deleteLater()
+        self.replay = None
         self.updatePlot()
-        
-        collision_info, collision_position = self.solarSystem.check_collisions()
-        if collision_info is not None:
-            self.timer.stop()
-            body1, body2 = collision_info
-            QMessageBox.information(self, "Collision Alert", f"Collision detected between bodies {body1} and {body2} at position {collision_position}.")
+
+    def connectStream(self):
+        # Thin client: draw frames published by `headless.py --serve` instead of simulating here
+        address, ok = QInputDialog.getText(self, "Connect to Stream", "Server (tcp://host:port or unix:///path):",
+                                           text='tcp://127.0.0.1:8765')
+        if not ok or not address:
+            return
+        from frame_server import FrameClient, parse_address
+        try:
+            parse_address(address)
+        except ValueError as e:
+            QMessageBox.warning(self, "Stream Error", str(e))
+            return
+        self.pauseSimulation()
+        self.closeReplay()
+        self.disconnectStream()
+        self.stream = FrameClient(address)
+        self.stream.start()
+        if self.displayTimer is None:
+            self.displayTimer = QTimer(self)
+            self.displayTimer.timeout.connect(self.renderLatest)
+        if not self.displayTimer.isActive():
+            self.displayTimer.start(16)
+
+    def disconnectStream(self):
+        if self.stream is None:
+            return
+        self.stream.close()
+        self.stream = None
+        self.streamMeta = None
+        self.lastSnapshot = None
+        with self.simLock:
+            snapshot = self.solarSystem.snapshot()
+        self.renderer.rebuild(snapshot)
+
+    def checkAutosave(self):
+        # Saves are written on a background thread, so failures are picked up here and reported once
+        checkpoints = self.checkpoints
+        if checkpoints is None or checkpoints.error is None or self.autosaveWarned:
+            return
+        self.autosaveWarned = True
+        self.statusBar().showMessage(f"Autosave to {checkpoints.path} failed: {checkpoints.error}")
+        QMessageBox.warning(self, "Autosave Error", f"Could not save the checkpoint to {checkpoints.path}. "
+                                                    f"Error: {checkpoints.error}")
+
+    def renderLatest(self):
+        # Draw only the newest snapshot; any published while the last frame was drawing are skipped
+        self.checkAutosave()
+        if self.stream is not None:
+            self.renderStream()
+            return
+        snapshot = self.worker.latest if self.worker is not None else None
+        if self.replay is not None or snapshot is None or snapshot is self.lastSnapshot:
+            return
+        self.lastSnapshot = snapshot
+        self.drawSnapshot(snapshot)
+
+    def renderStream(self):
+        stream = self.stream
+        if not stream.running:
+            self.disconnectStream()
+            message = f"The stream from {stream.address} ended."
+            if stream.error is not None:
+                message = f"Could not read the stream from {stream.address}. Error: {stream.error}"
+            QMessageBox.warning(self, "Stream Error", message)
+            return
+        snapshot = stream.latest
+        if snapshot is None or snapshot is self.lastSnapshot:
+            return
+        self.lastSnapshot = snapshot
+        if stream.meta_version != self.streamMeta:
+            # New bodies, colours or radii on the server
+            self.streamMeta = stream.meta_version
+            self.renderer.rebuild(snapshot)
+            return
+        self.drawSnapshot(snapshot)
+
+    def onCollision(self, collisions):
+        if self.worker is not None:
+            self.worker.pause()
+        self.renderLatest()
+        with self.simLock:
+            positions = self.solarSystem.positions
+            lines = [f"Collision detected between bodies {body1} and {body2} at position {positions[body1]}."
+                     for body1, body2 in collisions[:10]]
+        if len(collisions) > 10:
+            lines.append(f"... and {len(collisions) - 10} more collisions.")
+        QMessageBox.information(self, "Collision Alert", "\n".join(lines))
+
+    def onStepFailed(self, message):
+        self.renderLatest()
+        QMessageBox.warning(self, "Integration Error",
+                            f"The simulation was paused because a step failed. Try a smaller time step or another integrator.\n{message}")
 
     def toggleOrbitTrails(self):
-        for body in self.solarSystem.bodies:
-            body.show_trail = not body.show_trail
+        with self.simLock:
+            bodies = self.solarSystem.bodies
+            for index in np.flatnonzero(~self.solarSystem.particles):  # Test particles never get trails
+                bodies[index].show_trail = not bodies[index].show_trail
         self.updatePlot()
 
     def updatePlot(self):
-        self.ax.clear()
-        self.ax.clear()
-        for body in self.solarSystem.bodies:
-            body.draw(self.ax)
-        self.canvas.draw()
+        with self.simLock:
+            snapshot = self.solarSystem.snapshot()
+        self.drawSnapshot(snapshot)
+
+    def drawSnapshot(self, snapshot):
+        profiler = self.profiler
+        if profiler is None:
+            self.renderer.update(snapshot)
+            return
+        with profiler.phase('draw'):
+            self.renderer.update(snapshot)
+        profiler.count('frames')
+        profiler.gauge('bodies', len(snapshot.positions))
+        profiler.gauge('trail points', sum(len(trail) for trail in snapshot.trails if trail is not None))
+
+    def toggleProfiler(self):
+        # Timings are only taken while the HUD is shown; otherwise every site skips them
+        if self.profiler is None:
+            self.profiler = PhaseProfiler()
+            self.hudTimer = QTimer(self)
+            self.hudTimer.timeout.connect(self.updateHud)
+            self.hudTimer.start(500)
+        else:
+            self.hudTimer.stop()
+            self.hudTimer = None
+            self.profiler = None
+            self.statusBar().clearMessage()
+        with self.simLock:
+            self.solarSystem.profiler = self.profiler
+
+    def updateHud(self):
+        self.statusBar().showMessage(self.profiler.status_text())
+
+    def exportProfile(self):
+        if self.profiler is None:
+            QMessageBox.information(self, "Performance Profile", "Turn on the performance HUD first to collect timings.")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Performance Profile", "", "JSON (*.json);;CSV (*.csv)")
+        if not path:
+            return
+        try:
+            self.profiler.export(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Error", f"Could not write the profile. Error: {e}")
 
 
 
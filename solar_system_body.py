@@ -1,27 +1,79 @@
 import numpy as np
 from utilities import runge_kutta, AU
 
+class _StoreField:
+    # Reads/writes one row of a SolarSystem array, or the pending value before the body is added
+    def __init__(self, array_name):
+        self.array_name = array_name
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, body, owner=None):
+        if body is None:
+            return self
+        if body.index is None:
+            return body._state[self.name]
+        return getattr(body.solar_system, self.array_name)[body.index]
+
+    def __set__(self, body, value):
+        if body.index is None:
+            body._state[self.name] = value
+        else:
+            getattr(body.solar_system, self.array_name)[body.index] = value
+
 class SolarSystemBody:
+    __slots__ = ('solar_system', 'index', 'show_trail', 'visual_radius', '_state')
+
+    mass = _StoreField('masses')
+    radius = _StoreField('radii')  # Used for collision detection
+    position = _StoreField('positions')
+    velocity = _StoreField('velocities')
+    color = _StoreField('colors')
+    particle = _StoreField('particles')  # A test particle feels gravity but exerts none
+
     def __init__(self, solar_system, mass, radius, position, velocity):
         self.solar_system = solar_system
-        self.mass = mass
-        self.radius = radius  # Used for collision detection
-        self.position = np.array(position, dtype=np.float64)
-        self.velocity = np.array(velocity, dtype=np.float64)
-        self.history = []  # Store historical positions
+        self.index = None  # Set by SolarSystem.add_body
+        self._state = {
+            'mass': float(mass),
+            'radius': float(radius),
+            'position': np.array(position, dtype=np.float64),
+            'velocity': np.array(velocity, dtype=np.float64),
+            'color': None,
+            'particle': False,
+        }
         self.show_trail = True
 
         self.visual_radius = self.calculate_visual_radius()
 
+    @classmethod
+    def _view(cls, solar_system, index, visual_radius, show_trail=True):
+        # A body for a row already stored in solar_system's arrays, skipping the per-body setup in __init__
+        body = cls.__new__(cls)
+        body.solar_system = solar_system
+        body.index = index
+        body._state = None
+        body.show_trail = show_trail
+        body.visual_radius = visual_radius
+        return body
+
+    @property
+    def history(self):
+        # Recent positions, oldest first, from the system's trail buffer
+        if self.index is None:
+            return np.zeros((0, 3))
+        return self.solar_system.trails.points(self.index)
+
     def calculate_visual_radius(self):
         # Simple example: scale radius based on cube root of mass
         return (self.mass / 5.97e24)**(1/3) * 1e7  # Earth's mass as reference
-    
+
     def draw(self, ax):
-        if self.show_trail and len(self.history) > 1:
-            ax.plot(*np.array(self.history).T, linestyle='-', marker='', color=self.color)
+        history = self.history
+        if self.show_trail and len(history) > 1:
+            ax.plot(*history.T, linestyle='-', marker='', color=self.color)
         ax.scatter(*self.position, s=self.radius / AU * 100000, marker='o', color=self.color)
 
     def move(self, dt):
         runge_kutta(self, dt, self.solar_system)
-        self.history.append(self.position.copy())
@@ -0,0 +1,118 @@
+import numpy as np
+
+class _Ring:
+    # Fixed-capacity ring of (rows, capacity, 3) samples, each column stamped with its sample number
+    def __init__(self, capacity):
+        self.points = np.zeros((0, capacity, 3))
+        self.stamps = np.full(capacity, -1, dtype=np.int64)
+        self.head = 0
+
+    def grow(self, rows):
+        capacity = self.points.shape[1]
+        points = np.zeros((rows, capacity, 3))
+        points[:len(self.points)] = self.points
+        self.points = points
+
+    def push(self, positions, stamp):
+        self.points[:len(positions), self.head] = positions
+        self.stamps[self.head] = stamp
+        self.head = (self.head + 1) % len(self.stamps)
+
+    def copy_into(self, out, rows, first):
+        # Copy the given rows of out.shape[1] consecutive samples, starting `first` from the oldest, into out
+        count = out.shape[1]
+        capacity = len(self.stamps)
+        start = (self.head + first) % capacity
+        split = min(count, capacity - start)
+        out[:, :split] = self.points[rows, start:start + split]
+        out[:, split:] = self.points[rows, :count - split]
+
+    def chronological(self):
+        # Column indices from oldest to newest
+        return np.roll(np.arange(len(self.stamps)), -self.head)
+
+class TrailBuffer:
+    """Bounded orbit trails for every body of a SolarSystem, in preallocated NumPy ring buffers.
+
+    Positions are sampled every `stride` steps into a ring of `capacity` samples. Every
+    `decimation`-th sample also goes into a second ring of the same capacity, so once the first
+    ring wraps, the trail reaches back `decimation` times further at lower resolution. Memory and
+    drawing cost stay fixed however long the simulation runs. Only the first `max_bodies` bodies
+    get a trail, which keeps large populations from allocating gigabytes of history.
+    """
+
+    def __init__(self, capacity=500, stride=1, decimation=8, max_bodies=2000):
+        self.capacity = capacity
+        self.max_bodies = max_bodies
+        self.stride = stride
+        self.decimation = decimation
+        self.recent = _Ring(capacity)
+        self.older = _Ring(capacity)
+        self.steps = 0
+        self.samples = 0
+        self.cleared_at = 0  # Samples taken before this are hidden
+        self.since = np.zeros(0, dtype=np.int64)  # Sample number at which each body's trail starts
+        self.bodies = 0
+
+    def record(self, positions):
+        self.steps += 1
+        if self.steps % self.stride:
+            return
+        positions = positions[:self.max_bodies]
+        if len(positions) > self.bodies:
+            self._add_bodies(len(positions))
+        self.recent.push(positions, self.samples)
+        if self.samples % self.decimation == 0:
+            self.older.push(positions, self.samples)
+        self.samples += 1
+
+    def _add_bodies(self, n):
+        if n > len(self.since):
+            rows = max(n, 2 * len(self.since))
+            for ring in (self.recent, self.older):
+                ring.grow(rows)
+            since = np.zeros(rows, dtype=np.int64)
+            since[:self.bodies] = self.since[:self.bodies]
+            self.since = since
+        self.since[self.bodies:n] = self.samples
+        self.bodies = n
+
+    def clear(self):
+        self.cleared_at = self.samples
+
+    def points(self, index):
+        """Trail of one body as an (M,3) array, oldest first."""
+        if index >= self.bodies:
+            return np.zeros((0, 3))
+        start = max(self.since[index], self.cleared_at)
+        recent = self.recent.chronological()
+        recent = recent[self.recent.stamps[recent] >= start]
+        first_recent = self.recent.stamps[recent[0]] if len(recent) else self.samples
+        older = self.older.chronological()
+        older = older[(self.older.stamps[older] >= start) & (self.older.stamps[older] < first_recent)]
+        return np.concatenate((self.older.points[index, older], self.recent.points[index, recent]))
+
+    def points_of(self, indices):
+        """Trails of several bodies (all below `bodies`), each as points() would give it, gathered in one pass.
+
+        The trails are views into one array, so they share memory with each other but not with the rings.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        # Older samples up to the first recent one, then the recent samples, are in stamp order and every
+        # trail is a suffix of them, so both rings are copied once and each body starts at its own offset
+        recent = self.recent.stamps[self.recent.chronological()]
+        first = np.searchsorted(recent, 0)
+        first_recent = recent[first] if first < len(recent) else self.samples
+        older = self.older.stamps[self.older.chronological()]
+        older_first, older_end = np.searchsorted(older, [0, first_recent])
+        stamps = np.concatenate((older[older_first:older_end], recent[first:]))
+        starts = np.searchsorted(stamps, np.maximum(self.since[indices], self.cleared_at))
+        skip = int(starts.min()) if len(indices) else len(stamps)
+        rows = indices
+        if len(indices) and np.all(np.diff(indices) == 1):
+            rows = slice(indices[0], indices[-1] + 1)  # Slicing copies much faster than a gather
+        gathered = np.empty((len(indices), len(stamps) - skip, 3))
+        from_older = max(0, older_end - older_first - skip)
+        self.older.copy_into(gathered[:, :from_older], rows, older_end - from_older)
+        self.recent.copy_into(gathered[:, from_older:], rows, len(recent) - (len(stamps) - skip - from_older))
+        return [trail[start:] for trail, start in zip(gathered, (starts - skip).tolist())]
@@ -0,0 +1,171 @@
+import json
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+from solar_system import SolarSystemSnapshot
+
+INDEX_FILE = 'index.json'
+FORMAT_VERSION = 1
+
+class TrajectoryRecorder:
+    """Streams the state of a SolarSystem to memory-mapped .npy chunks in a directory.
+
+    Each chunk holds up to `chunk_frames` frames as a (frames, 2, N, 3) array of positions and
+    velocities, with a matching times array; by default a chunk is sized to about `chunk_bytes`,
+    so it stays small however many bodies there are. A new chunk starts whenever the current one
+    is full or the number of bodies changes. index.json lists the chunks and is rewritten whenever
+    a chunk is opened, every `index_interval` seconds and on close(), so a reader (or a crash)
+    never misses more than a few seconds of frames. Frames are never rewritten or held in memory.
+    """
+
+    def __init__(self, directory, chunk_frames=None, every=1, chunk_bytes=64 * 2**20, index_interval=5.0):
+        self.directory = directory
+        self.chunk_frames = chunk_frames  # None sizes each chunk from chunk_bytes
+        self.chunk_bytes = chunk_bytes
+        self.every = every  # Record one frame per `every` calls to record()
+        self.index_interval = index_interval
+        self.calls = 0
+        self.chunks = []
+        self._frames = None
+        self._times = None
+        self._index_due = time.monotonic() + index_interval
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, solar_system):
+        self.record_frames(solar_system, [solar_system.time], solar_system.positions[None], solar_system.velocities[None])
+
+    def record_frames(self, solar_system, times, positions, velocities):
+        # Frames produced by SolarSystem.advance; solar_system supplies the colors, radii and test particles
+        for frame_time, frame_positions, frame_velocities in zip(times, positions, velocities):
+            self.calls += 1
+            if self.calls % self.every:
+                continue
+            n = len(frame_positions)
+            if self._frames is None or self.chunks[-1]['frames'] == len(self._times) or self.chunks[-1]['bodies'] != n:
+                self._open_chunk(solar_system)
+            chunk = self.chunks[-1]
+            frame = chunk['frames']
+            self._frames[frame, 0] = frame_positions
+            self._frames[frame, 1] = frame_velocities
+            self._times[frame] = frame_time
+            chunk['frames'] += 1
+        if self._frames is not None and time.monotonic() >= self._index_due:
+            self._flush()
+            self._write_index()
+
+    def _open_chunk(self, solar_system):
+        self._flush()
+        number = len(self.chunks)
+        frame_bytes = 2 * 3 * 8 * max(len(solar_system.bodies), 1)
+        frames = self.chunk_frames or min(1024, max(1, self.chunk_bytes // frame_bytes))
+        chunk = {'file': f'chunk_{number:05d}.npy', 'times': f'times_{number:05d}.npy', 'frames': 0,
+                 'bodies': len(solar_system.bodies), 'colors': list(solar_system.colors),
+                 'radii': solar_system.radii.tolist(), 'particles': np.flatnonzero(solar_system.particles).tolist()}
+        self._frames = np.lib.format.open_memmap(os.path.join(self.directory, chunk['file']), mode='w+',
+                                                 dtype=np.float64, shape=(frames, 2, chunk['bodies'], 3))
+        self._times = np.lib.format.open_memmap(os.path.join(self.directory, chunk['times']), mode='w+',
+                                                dtype=np.float64, shape=(frames,))
+        self.chunks.append(chunk)
+        self._write_index()
+
+    def _flush(self):
+        if self._frames is not None:
+            self._frames.flush()
+            self._times.flush()
+
+    def _write_index(self):
+        self._index_due = time.monotonic() + self.index_interval
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'chunks': self.chunks}, f)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        self._flush()
+        self._write_index()
+        self._frames = self._times = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TrajectoryReader:
+    """Random access to a recorded trajectory without loading it into memory.
+
+    Only the `max_open` most recently used chunks are kept memory-mapped (each map holds a file
+    descriptor), so recordings of any length can be scrubbed through.
+    """
+
+    def __init__(self, directory, max_open=4):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            index = json.load(f)
+        if index['version'] > FORMAT_VERSION:
+            raise ValueError(f"Unsupported trajectory format version {index['version']}")
+        self.chunks = [chunk for chunk in index['chunks'] if chunk['frames']]
+        self._starts = np.cumsum([0] + [chunk['frames'] for chunk in self.chunks])
+        self.max_open = max_open
+        self._open = OrderedDict()  # Chunk number -> (frames, times) memory maps, least recently used first
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def _locate(self, frame):
+        if not 0 <= frame < len(self):
+            raise IndexError(f"Frame {frame} out of range for {len(self)} frames")
+        number = int(np.searchsorted(self._starts, frame, side='right')) - 1
+        return number, frame - int(self._starts[number])
+
+    def _chunk(self, number):
+        # (frames, times) memory maps of one chunk; evicted maps are closed once nothing else refers to them
+        arrays = self._open.get(number)
+        if arrays is not None:
+            self._open.move_to_end(number)
+            return arrays
+        chunk = self.chunks[number]
+        arrays = self._open[number] = (np.load(os.path.join(self.directory, chunk['file']), mmap_mode='r'),
+                                       np.load(os.path.join(self.directory, chunk['times']), mmap_mode='r'))
+        while len(self._open) > self.max_open:
+            self._open.popitem(last=False)
+        return arrays
+
+    def frame(self, frame):
+        """(time, positions, velocities) of one frame; the arrays are read-only views into the file."""
+        number, offset = self._locate(frame)
+        frames, times = self._chunk(number)
+        return float(times[offset]), frames[offset, 0], frames[offset, 1]
+
+    def _history(self, number, offset, count, columns):
+        # Positions of the given bodies over up to `count` frames ending at `offset` of chunk `number`,
+        # reaching back through earlier chunks as long as they hold the same bodies
+        bodies = self.chunks[number]['bodies']
+        pieces = []
+        while count > 0 and number >= 0 and self.chunks[number]['bodies'] == bodies:
+            frames, _ = self._chunk(number)
+            start = max(0, offset - count + 1)
+            pieces.append(frames[start:offset + 1, 0][:, columns])
+            count -= offset + 1 - start
+            number -= 1
+            if number >= 0:
+                offset = self.chunks[number]['frames'] - 1
+        return np.concatenate(pieces[::-1])
+
+    def snapshot(self, frame, trail_frames=500):
+        # Drawable state at one frame, with trails built from up to trail_frames frames ending at it
+        number, offset = self._locate(frame)
+        chunk = self.chunks[number]
+        particles = None
+        if chunk.get('particles'):  # Test particles are drawn without trails
+            particles = np.zeros(chunk['bodies'], dtype=bool)
+            particles[chunk['particles']] = True
+        with_trails = np.flatnonzero(~particles) if particles is not None else np.arange(chunk['bodies'])
+        history = self._history(number, offset, trail_frames, with_trails)
+        trails = [None] * chunk['bodies']
+        for column, index in enumerate(with_trails.tolist()):
+            trails[index] = history[:, column]
+        frames, times = self._chunk(number)
+        return SolarSystemSnapshot(float(times[offset]), np.array(frames[offset, 0]), np.array(chunk['radii']),
+                                   list(chunk['colors']), trails, particles)
@@ -1,8 +1,7 @@
 import numpy as np
-from scipy.constants import G
 
 # Constants
-G = G  # Gravitational constant from scipy.constants
+G = 6.67430e-11  # Gravitational constant in m^3 kg^-1 s^-2 (CODATA 2018, the value scipy.constants uses)
 AU = 1.496e+11  # Astronomical unit in meters
 
 
@@ -10,7 +9,7 @@ def runge_kutta(body, dt, solar_system):
         def calculate_gravitational_acceleration(position):
             acceleration = np.zeros_like(position)
             for other_body in solar_system.bodies:
-                if other_body != body:
+                if other_body != body and not other_body.particle:  # Test particles exert no gravity
                     distance_vector = other_body.position - position
                     distance_mag = np.linalg.norm(distance_vector)
                     force_mag = G * body.mass * other_body.mass / distance_mag**2
@@ -32,3 +31,37 @@ def runge_kutta(body, dt, solar_system):
 
 def calculate_stable_orbital_velocity(mass_central_body, distance):
     return np.sqrt(G * mass_central_body / distance)
+
+def circular_orbit_velocities(mass_central_body, offsets, normals=(0, 0, 1)):
+    """Velocities, relative to the central body, for circular orbits at the given (N,3) offsets from it.
+
+    Each orbit runs anticlockwise about its normal (one shared (3,) vector or one per body); the
+    offsets should be perpendicular to their normals.
+    """
+    offsets = np.asarray(offsets, dtype=np.float64)
+    distance = np.linalg.norm(offsets, axis=1)
+    directions = np.cross(np.broadcast_to(normals, offsets.shape), offsets)
+    norms = np.linalg.norm(directions, axis=1)
+    speed = calculate_stable_orbital_velocity(mass_central_body, distance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(norms[:, None] > 0, directions * (speed / norms)[:, None], 0.0)
+
+def orbital_elements(positions, velocities, masses, central=0):
+    """Semi-major axis, eccentricity and inclination (radians) of every body's two-body orbit about the central one.
+
+    Unbound bodies get a negative semi-major axis; the central body itself gets NaN for all three.
+    """
+    mu = G * (masses + masses[central])
+    r = positions - positions[central]
+    v = velocities - velocities[central]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        distance = np.linalg.norm(r, axis=1)
+        energy = 0.5 * np.einsum('ij,ij->i', v, v) - mu / distance
+        semi_major_axis = -mu / (2 * energy)
+        h = np.cross(r, v)
+        eccentricity_vector = np.cross(v, h) / mu[:, None] - r / distance[:, None]
+        eccentricity = np.linalg.norm(eccentricity_vector, axis=1)
+        inclination = np.arccos(np.clip(h[:, 2] / np.linalg.norm(h, axis=1), -1, 1))
+    for element in (semi_major_axis, eccentricity, inclination):
+        element[central] = np.nan
+    return semi_major_axis, eccentricity, inclination